@@ -0,0 +1,85 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+COLUMNS = ["Tom_X", "Tom_Y", "Jerry_X", "Jerry_Y", "Spike_X", "Spike_Y"]
+
+class GameLogStore:
+    """
+    Appends the state logs of many games to one binary store.
+
+    The store is two raw files next to each other: <path>.dat holds the
+    int16 rows of all games back to back, and <path>.idx holds one int64 row
+    (id, running_id, offset, length) per game, with offset and length in rows.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.offset = os.path.getsize(path + ".dat") // (2 * len(COLUMNS)) if os.path.exists(path + ".dat") else 0
+
+    def append(self, id, running_id, log):
+        log = np.ascontiguousarray(log, dtype=np.int16)
+        with open(self.path + ".dat", "ab") as f:
+            f.write(log.tobytes())
+        with open(self.path + ".idx", "ab") as f:
+            f.write(np.array([id, running_id, self.offset, len(log)], dtype=np.int64).tobytes())
+        self.offset += len(log)
+
+    def extend(self, entries):
+        for id, running_id, log in entries:
+            self.append(id, running_id, log)
+
+class GameLogBuffer:
+    """Collects logs in memory with the GameLogStore interface, e.g. to send them back from a worker process"""
+
+    def __init__(self):
+        self.entries = []
+
+    def append(self, id, running_id, log):
+        self.entries.append((id, running_id, np.array(log, dtype=np.int16)))
+
+class GameLogReader:
+    """Reads single games out of a GameLogStore without loading the whole store"""
+
+    def __init__(self, path):
+        self.index = np.fromfile(path + ".idx", dtype=np.int64).reshape(-1, 4)
+        if len(self.index):
+            self.data = np.memmap(path + ".dat", dtype=np.int16, mode="r").reshape(-1, len(COLUMNS))
+        else:
+            self.data = np.zeros((0, len(COLUMNS)), dtype=np.int16)
+        # games stored more than once keep their latest log
+        self.games = {(int(id), int(running_id)): (int(offset), int(length))
+                      for id, running_id, offset, length in self.index}
+
+    def __len__(self):
+        return len(self.games)
+
+    def keys(self):
+        return sorted(self.games)
+
+    def get(self, id, running_id):
+        """The (steps, 6) state log of one game"""
+        offset, length = self.games[(id, running_id)]
+        return self.data[offset:offset+length]
+
+    def to_csv(self, directory):
+        """Writes every game as <id>_<running_id>.csv, the format of Task.save_log"""
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        for id, running_id in self.keys():
+            path_df = pd.DataFrame(data=self.get(id, running_id), columns=COLUMNS)
+            path_df.to_csv(os.path.join(directory, str(id)+"_"+str(running_id)+".csv"), index=False)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a binary game log store to per-game csv files")
+    parser.add_argument("path", help="store path, without the .dat/.idx extension")
+    parser.add_argument("--csv", default="data/proj_iii_solutions/", help="output directory")
+    args = parser.parse_args()
+
+    reader = GameLogReader(args.path)
+    reader.to_csv(args.csv)
+    print ("Wrote %d games to %s" % (len(reader), args.csv))
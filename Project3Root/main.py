@@ -1,7 +1,10 @@
+import argparse
 import numpy as np 
 import pandas as pd
+import inspect
 import random
 import os
+import time
 
 from planners.tom import PlannerAgent as Tom
 from planners.jerry import PlannerAgent as Jerry
@@ -11,51 +14,105 @@ def manhattan_distance(p1, p2):
     """Computes the Manhattan distance between two points (row, col)."""
     return abs(p1[0] - p2[0]) + abs(p1[1] - p2[1])
 
-def select_valid_locations(grid, num_points=3, min_distance=5):
+def select_valid_locations(grid, num_points=3, min_distance=5, rng=random):
     # Find all valid (non-obstacle) positions
     free_positions = list(map(tuple, np.argwhere(grid == 0)))
     if len(free_positions) < num_points:
         raise ValueError("Not enough free spaces to select locations!")
 
     selected_positions = []
-    first_pos = random.choice(free_positions)
+    first_pos = rng.choice(free_positions)
     selected_positions.append(first_pos)
     while len(selected_positions) < num_points:
-        candidate = random.choice(free_positions)
+        candidate = rng.choice(free_positions)
         # Ensure the candidate is at least `min_distance` away from all selected positions
         if all(manhattan_distance(candidate, pos) >= min_distance for pos in selected_positions):
             selected_positions.append(candidate)
 
     return np.array(selected_positions)
 
+# cell values of Task.padded_world
+FREE, OBSTACLE, OUTSIDE = 0, 1, 2
+
+def accepts_deadline(agent):
+    """Whether the agent's plan_action takes a deadline keyword"""
+    return "deadline" in inspect.signature(agent.plan_action).parameters
+
 class Task:
     """Base class of a task"""
     def __init__(self, id, running_id,
-                 max_iter=1000, prob=[0.3,0.3,0.4]):
+                 max_iter=1000, prob=[0.3,0.3,0.4], seed=None,
+                 log_store=None, time_budget=None):
         self.id = id
         self.running_id = running_id
         self.max_iter = max_iter
+        # an optional gamelog.GameLogStore (or anything with its append method) replacing the csv logs
+        self.log_store = log_store
         self.prob = prob
 
         self.world = np.load("data/grid_files/grid_"+str(id)+".npy")
         self.obstacles = np.array(np.where(self.world==1)).T
+        # the world padded by one cell, so that bounds and obstacles are a single lookup
+        self.padded_world = np.pad(self.world.astype(np.int8), 1, constant_values=OUTSIDE)
+
+        # One random stream for the game and one per agent, all derived from (seed, id, running_id).
+        # Without a seed the streams are drawn from fresh entropy.
+        seeds = np.random.SeedSequence(None if seed is None else [seed, id, running_id]).spawn(4)
+        self.rng = random.Random(int(seeds[0].generate_state(1)[0]))
+        self.np_rng = np.random.default_rng(seeds[0])
 
         self.agents = [Tom(), Jerry(), Spike()]
+        for agent, agent_seed in zip(self.agents, seeds[1:]):
+            # optional API, agents without set_rng use the global generators
+            if hasattr(agent, "set_rng"):
+                agent.set_rng(random.Random(int(agent_seed.generate_state(1)[0])),
+                              np.random.default_rng(agent_seed))
+            # optional API as well, for agents that plan with the slip probabilities
+            if hasattr(agent, "set_prob"):
+                agent.set_prob(self.prob)
+
+        # Seconds per decision, one value for all agents or one per agent (None for no limit).
+        # Agents whose plan_action takes a deadline are given time.perf_counter() + their budget.
+        self.time_budget = list(time_budget) if np.ndim(time_budget) else [time_budget] * 3
+        self.takes_deadline = [accepts_deadline(agent) for agent in self.agents]
 
     def save_log(self):
+        if self.log_store is not None:
+            self.log_store.append(self.id, self.running_id, self.state_log[:self.log_len])
+            return
         if not os.path.exists("data/proj_iii_solutions/"):
             os.makedirs("data/proj_iii_solutions/")
-        data = np.array([np.hstack(self.state_log[i]) for i in range(len(self.state_log))])
-        path_df = pd.DataFrame(data=data, columns=["Tom_X", "Tom_Y", "Jerry_X", "Jerry_Y", "Spike_X", "Spike_Y"])
+        path_df = pd.DataFrame(data=self.state_log[:self.log_len], columns=["Tom_X", "Tom_Y", "Jerry_X", "Jerry_Y", "Spike_X", "Spike_Y"])
         path_df.to_csv("data/proj_iii_solutions/"+str(self.id)+"_"+str(self.running_id)+".csv", index=False)
 
     def reset(self):
-        self.state = select_valid_locations(self.world, num_points=3, min_distance=3)
+        self.state = select_valid_locations(self.world, num_points=3, min_distance=3, rng=self.rng)
         self.legal_agents = [True, True, True]
-        self.state_log = [self.state]
+        # one row (Tom_X, Tom_Y, Jerry_X, Jerry_Y, Spike_X, Spike_Y) per step, filled up to log_len
+        self.state_log = np.zeros((self.max_iter+1, 6), dtype=np.int16)
+        self.state_log[0] = self.state.ravel()
+        self.log_len = 1
+        # seconds each agent took to decide, one row per step
+        self.latency = np.zeros((self.max_iter, 3))
+
+    def plan(self, i, current, pursued, pursuer):
+        """Asks agent i for its action and records how long it took to decide"""
+        agent = self.agents[i]
+        t0 = time.perf_counter()
+        if self.takes_deadline[i] and self.time_budget[i] is not None:
+            action = agent.plan_action(self.world, current, pursued, pursuer, deadline=t0 + self.time_budget[i])
+        else:
+            action = agent.plan_action(self.world, current, pursued, pursuer)
+        self.latency[self.log_len - 1, i] = time.perf_counter() - t0
+        return action
+
+    def latency_stats(self):
+        """Decision latency of the last game in seconds, rows p50, p95 and max with one column per agent"""
+        latency = self.latency[:self.log_len - 1]
+        return np.vstack([np.percentile(latency, [50, 95], axis=0), latency.max(axis=0)])
 
     def mod_action(self, a):
-        mod_action_idx = np.random.choice(3,p=self.prob)
+        mod_action_idx = self.np_rng.choice(3,p=self.prob)
         if mod_action_idx == 1:
             return a 
         if mod_action_idx == 0:
@@ -64,19 +121,14 @@ class Task:
             return np.array([a[1], -a[0]])
 
     def step(self):
-        tom_a = self.mod_action(self.agents[0].plan_action(self.world, self.state[0], self.state[1], self.state[2]))
-        jerry_a = self.mod_action(self.agents[1].plan_action(self.world, self.state[1], self.state[2], self.state[0]))
-        spike_a = self.mod_action(self.agents[2].plan_action(self.world, self.state[2], self.state[0], self.state[1]))
+        tom_a = self.mod_action(self.plan(0, self.state[0], self.state[1], self.state[2]))
+        jerry_a = self.mod_action(self.plan(1, self.state[1], self.state[2], self.state[0]))
+        spike_a = self.mod_action(self.plan(2, self.state[2], self.state[0], self.state[1]))
         
-        actions = [tom_a, jerry_a, spike_a]
+        actions = np.array([tom_a, jerry_a, spike_a])
 
-        is_a_valid = np.array([self.check_action(self.state[0], tom_a),
-                               self.check_action(self.state[1], jerry_a),
-                               self.check_action(self.state[2], spike_a)])
-        
-        for a in range(3):
-            if is_a_valid[a]:
-                self.state[a] += actions[a]
+        is_a_valid = self.check_actions(self.state, actions)
+        self.state[is_a_valid] += actions[is_a_valid]
 
     def run(self):
         self.reset()
@@ -84,11 +136,10 @@ class Task:
         tom_wins, jer_wins, spk_wins = False, False, False
         while not done:
             self.step()
-            self.state_log += [np.copy(self.state)]
+            self.state_log[self.log_len] = self.state.ravel()
+            self.log_len += 1
 
-            collisions = [self.check_collision(self.state[0]),
-                          self.check_collision(self.state[1]),
-                          self.check_collision(self.state[2])]
+            collisions = self.check_collisions(self.state)
 
             tom_wins = np.all(self.state[0]==self.state[1]) and not collisions[0]
             jer_wins = np.all(self.state[1]==self.state[2]) and not collisions[1]
@@ -98,7 +149,7 @@ class Task:
                 done = True
             if np.any(np.array(collisions)):
                 done = True
-            if len(self.state_log)==self.max_iter:
+            if self.log_len==self.max_iter:
                 done = True 
 
         self.save_log()
@@ -114,19 +165,33 @@ class Task:
         return np.array([1, 1, 1])
 
     def check_action(self, state, action):
-        state_ = state + action
-        is_valid_action = np.all(abs(action)<=1)
-        is_inbound = np.min(state_)>=0 and np.max(state_)<=29
+        return self.check_actions(np.array([state]), np.array([action]))[0]
+
+    def check_actions(self, states, actions):
+        """Checks the actions of all agents at once, valid actions are unit moves that stay in bounds"""
+        is_valid_action = np.all(abs(actions)<=1, axis=1)
+        # invalid actions may jump past the padding, look up the agent's own cell for those
+        states_ = states + actions * is_valid_action[:, None]
+        is_inbound = self.padded_world[states_[:, 0]+1, states_[:, 1]+1] != OUTSIDE
+
+        return is_valid_action & is_inbound
 
-        return is_valid_action and is_inbound
-    
     def check_collision(self, state):
-        return np.any(np.all(self.obstacles==state, axis=1))
+        return self.padded_world[state[0]+1, state[1]+1] == OBSTACLE
+
+    def check_collisions(self, states):
+        """Checks whether any of the agents stands on an obstacle"""
+        return self.padded_world[states[:, 0]+1, states[:, 1]+1] == OBSTACLE
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play every grid 5 times")
+    parser.add_argument("--seed", type=int, default=0, help="base seed, the same as tournament.py --seed plays the same games")
+    # other arguments, like the --name of eval.sh, are ignored
+    args, _ = parser.parse_known_args()
+
     # Test all grid tasks with each task tested for 5 times
     for id in range(100):
         for running_id in range(5):
-            T = Task(id, running_id)
+            T = Task(id, running_id, seed=args.seed)
             result = T.run()
             print (id, running_id, result)
\ No newline at end of file
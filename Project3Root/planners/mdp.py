@@ -0,0 +1,207 @@
+import time
+import numpy as np
+
+from planners.distances import DIRECTIONS, all_pairs
+
+# the default slip probabilities of Task: rotated left, kept, rotated right
+DEFAULT_PROB = (0.3, 0.3, 0.4)
+
+def rotations():
+    """ROTATIONS[k, a] is the index of action a after the rotation k (left, kept, right) of Task.mod_action"""
+    index = {(int(dx), int(dy)): a for a, (dx, dy) in enumerate(DIRECTIONS)}
+    left = [index[(-dy, dx)] for dx, dy in index]
+    right = [index[(dy, -dx)] for dx, dy in index]
+    return np.array([left, list(range(len(DIRECTIONS))), right])
+
+ROTATIONS = rotations()
+
+class PursuitMDP:
+    """
+    The game of one agent as two MDPs over pairs of free cells, with the slip model of Task.mod_action:
+
+    - chase, over (own cell, pursued cell): +1 for landing on the pursued, which moves at random.
+    - evade, over (own cell, pursuer cell): -1 for being landed on by the pursuer, which takes the
+      first step of a shortest path towards the agent and slips like the agent does.
+
+    Both give -1 for running into an obstacle. The opponents are assumed to stay in place instead
+    of crashing. States are indices into free, the cell indices row * cols + column of the free cells.
+    """
+
+    def __init__(self, world, prob=DEFAULT_PROB, gamma=0.95):
+        world = np.asarray(world)
+        rows, cols = world.shape
+        self.prob = np.asarray(prob, dtype=np.float32)
+        self.gamma = gamma
+        self.free = np.flatnonzero(world.ravel() == 0)
+        n = len(self.free)
+        self.n = n
+        self.state_of = np.full(world.size, -1)
+        self.state_of[self.free] = np.arange(n)
+
+        # move[s, b] is the state after actually moving by action b from s, the same state if b
+        # leaves the world or runs into an obstacle; crash[s, b] marks the latter
+        r, c = np.divmod(self.free, cols)
+        nr = r[:, None] + DIRECTIONS[:, 0]
+        nc = c[:, None] + DIRECTIONS[:, 1]
+        inside = (nr >= 0) & (nr < rows) & (nc >= 0) & (nc < cols)
+        cell = np.where(inside, nr * cols + nc, self.free[:, None])
+        self.crash = world.ravel()[cell] == 1
+        self.move = np.where(self.crash, np.arange(n)[:, None], self.state_of[cell])
+
+        # the pursuer's landing state for each slip k, pursuer_move[k, x, z] for the agent at x and the pursuer at z
+        _, next_hop = all_pairs(world)
+        hop = np.maximum(next_hop[np.ix_(self.free, self.free)].T, 0)
+        self.pursuer_move = np.stack([self.move[np.arange(n)[None, :], ROTATIONS[k][hop]] for k in range(3)])
+
+    def slip(self, M):
+        """Expected values of the intended actions from the values M[b] of the actual moves b"""
+        return sum(p * M[ROTATIONS[k]] for k, p in enumerate(self.prob))
+
+    def chase_backup(self, V, rows=None):
+        """One Bellman backup of the chase MDP for the own states rows (all by default), returns Q[a, row, pursued state]"""
+        rows = np.arange(self.n) if rows is None else rows
+        # W[x', y] for the cells x' the agent can land on: expected outcome of the pursued's random move from y
+        landing = np.unique(self.move[rows])
+        own = landing[:, None]
+        W = np.zeros((len(landing), self.n), dtype=np.float32)
+        for m in range(len(DIRECTIONS)):
+            landed = self.move[:, m][None, :]
+            W += np.where(own == landed, 1, self.gamma * V[own, landed])
+        W /= len(DIRECTIONS)
+        M = np.stack([np.where(self.crash[rows, b, None], -1, W[np.searchsorted(landing, self.move[rows, b])])
+                      for b in range(len(DIRECTIONS))])
+        return self.slip(M)
+
+    def evade_backup(self, V, rows=None):
+        """One Bellman backup of the evade MDP for the own states rows (all by default), returns Q[a, row, pursuer state]"""
+        rows = np.arange(self.n) if rows is None else rows
+        M = np.zeros((len(DIRECTIONS), len(rows), self.n), dtype=np.float32)
+        for b in range(len(DIRECTIONS)):
+            own = self.move[rows, b][:, None]
+            for k, p in enumerate(self.prob):
+                landed = self.pursuer_move[k][rows]
+                M[b] += p * np.where(own == landed, -1, self.gamma * V[own, landed])
+            M[b][self.crash[rows, b]] = -1
+        return self.slip(M)
+
+    def blocks(self, block_size):
+        """
+        Splits the own states into blocks of block_size, returns the blocks and for every
+        block the blocks whose backups read its values.
+        """
+        blocks = [np.arange(start, min(start + block_size, self.n)) for start in range(0, self.n, block_size)]
+        readers = [set() for _ in blocks]
+        for b, rows in enumerate(blocks):
+            # a backup of rows reads the values of the states the agent can land on
+            for c in np.unique(self.move[rows] // block_size):
+                readers[c].add(b)
+        return blocks, [sorted(r) for r in readers]
+
+def value_iteration(mdp, backup, V=None, tol=1e-3, max_sweeps=500, method="prioritized", block_size=64, stats=None):
+    """
+    Solves one of the MDPs of a PursuitMDP from the values V (zero by default, or a
+    previous solution to warm start from) until the values change by less than tol.
+
+    Parameters:
+    - backup: mdp.chase_backup or mdp.evade_backup.
+    - method (str): "jacobi" backs up all states from the values of the last sweep,
+      "gauss-seidel" backs up blocks of own states in turn, each one reading the values
+      the earlier blocks of the sweep just wrote, and "prioritized" only backs up the
+      blocks whose values may still change by tol or more, largest first. A block's
+      bound grows by gamma times every change of a block it reads from and is reset when
+      it is backed up. Once no bound reaches tol, a full sweep checks the values, the
+      solve only ends when that sweep changes them by less than tol.
+    - stats (dict): optional, receives per sweep lists "residuals" (largest change of a
+      value), "sweep_times" (seconds) and "backups" (number of own states backed up).
+
+    Returns:
+    - np.ndarray: the Q-values as Q[own state, other state, a].
+    """
+    n = mdp.n
+    V = np.zeros((n, n), dtype=np.float32) if V is None else np.array(V, dtype=np.float32)
+    Q = np.empty((n, n, len(DIRECTIONS)), dtype=np.float32)
+    if stats is not None:
+        stats.update(residuals=[], sweep_times=[], backups=[])
+
+    blocks, readers = mdp.blocks(n if method == "jacobi" else block_size)
+    # an upper bound of how much the values of each block can still change
+    bound = np.full(len(blocks), np.inf)
+    check = method != "prioritized"
+    for _ in range(max_sweeps):
+        t0 = time.perf_counter()
+        order = [] if check else [b for b in np.argsort(-bound) if bound[b] >= tol]
+        if not order:
+            # a full sweep, of the other methods or to check the bounds of the prioritized one
+            check = True
+            order = range(len(blocks))
+        residual = 0.0
+        backups = 0
+        for b in order:
+            rows = blocks[b]
+            q = backup(V, rows)
+            Q[rows] = q.transpose(1, 2, 0)
+            values = q.max(axis=0)
+            change = float(np.abs(values - V[rows]).max())
+            V[rows] = values
+            residual = max(residual, change)
+            backups += len(rows)
+            bound[b] = 0
+            for reader in readers[b]:
+                bound[reader] += mdp.gamma * change
+        if stats is not None:
+            stats["residuals"].append(residual)
+            stats["sweep_times"].append(time.perf_counter() - t0)
+            stats["backups"].append(backups)
+        if check and residual < tol:
+            break
+        check = method != "prioritized"
+    return Q
+
+class MDPPolicy:
+    """
+    The solved chase and evade MDPs of one grid and slip probabilities. Actions are picked
+    by a table lookup of both Q-values, summed: catching the pursued is worth +1, and
+    being caught or running into an obstacle -1.
+    """
+
+    def __init__(self, state_of, cols, chase, evade):
+        self.state_of = state_of   # state of every cell index, -1 for obstacles
+        self.cols = cols
+        self.chase = chase     # chase[own state, pursued state, a]
+        self.evade = evade     # evade[own state, pursuer state, a]
+
+    def action(self, current, pursued, pursuer):
+        """Index into DIRECTIONS of the best action, None if a position is not a free cell"""
+        s, t, u = (self.state_of[int(p[0]) * self.cols + int(p[1])] for p in (current, pursued, pursuer))
+        if min(s, t, u) < 0:
+            return None
+        return int(np.argmax(self.chase[s, t] + self.evade[s, u]))
+
+    def actions(self, current, pursued, pursuer):
+        """Vectorized action for (B, 2) arrays of positions, indices into DIRECTIONS with -1 where a position is not a free cell"""
+        s, t, u = (self.state_of[p[:, 0] * self.cols + p[:, 1]] for p in (current, pursued, pursuer))
+        valid = (s >= 0) & (t >= 0) & (u >= 0)
+        s, t, u = s * valid, t * valid, u * valid
+        best = np.argmax(self.chase[s, t].astype(np.float32) + self.evade[s, u], axis=1)
+        return np.where(valid, best, -1)
+
+ROLES = ["chase", "evade"]
+
+def free_states(world):
+    """The state of every cell index of world, -1 for obstacles"""
+    free = np.asarray(world).ravel() == 0
+    return np.where(free, np.cumsum(free) - 1, -1)
+
+def solve_role(world, prob=DEFAULT_PROB, role="chase", gamma=0.95, tol=1e-3, V=None, method="prioritized", stats=None):
+    """
+    Solves one of the ROLES MDPs of world with value_iteration, warm started from the values V
+    if given. Returns its Q-values as Q[own state, other state, a].
+    """
+    mdp = PursuitMDP(world, prob, gamma)
+    backup = mdp.chase_backup if role == "chase" else mdp.evade_backup
+    return value_iteration(mdp, backup, V, tol, method=method, stats=stats)
+
+def solve_policy(world, prob=DEFAULT_PROB, gamma=0.95, tol=1e-3):
+    """Builds and solves both MDPs of world, returns their MDPPolicy"""
+    chase, evade = (solve_role(world, prob, role, gamma, tol) for role in ROLES)
+    return MDPPolicy(free_states(world), np.asarray(world).shape[1], chase, evade)
@@ -0,0 +1,96 @@
+import os
+import numpy as np
+from collections import OrderedDict
+
+from planners.distances import KEY_LENGTH, world_key
+from planners.mdp import DEFAULT_PROB, ROLES, MDPPolicy, free_states, solve_role
+
+# Solved MDPs are stored as data/policies/mdp_<key>_<p1>_<p2>_<p3>_<role>.npy, with the
+# probabilities written by repr so that distinct ones never share a file
+POLICY_DIR = "data/policies"
+
+_tables = OrderedDict()
+TABLE_CACHE_SIZE = 8
+# largest L1 distance of the slip probabilities of a stored table used to warm start a new one
+WARM_START_DISTANCE = 0.2
+
+def cache_key(world, prob, role):
+    return world_key(world), tuple(float(p) for p in prob), role
+
+def table_path(key, directory=POLICY_DIR):
+    world_hash, prob, role = key
+    return os.path.join(directory, "mdp_" + world_hash[:KEY_LENGTH] + "_" + "_".join(repr(p) for p in prob)
+                        + "_" + role + ".npy")
+
+def save_table(path, table, prob):
+    """
+    Writes float16 Q-values through a temporary file so that readers never map a partial table.
+    The file holds one record of the exact slip probabilities and the Q-values.
+    """
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    data = np.zeros(1, dtype=[("prob", np.float64, len(prob)), ("q", np.float16, table.shape)])
+    data["prob"][0] = prob
+    data["q"][0] = table
+    tmp = path + "." + str(os.getpid()) + ".tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, data)
+    os.replace(tmp, path)
+
+def load_table(path):
+    """Memory-maps a table written by save_table, returns its slip probabilities and Q-values"""
+    data = np.load(path, mmap_mode="r")
+    return tuple(float(p) for p in data["prob"][0]), data["q"][0]
+
+def nearest_table(world, prob, role, directory=POLICY_DIR):
+    """
+    The stored table of the same world and role whose slip probabilities are closest to prob,
+    None if there is none within WARM_START_DISTANCE.
+    """
+    prefix = "mdp_" + world_key(world)[:KEY_LENGTH] + "_"
+    suffix = "_" + role + ".npy"
+    best, best_distance = None, WARM_START_DISTANCE
+    names = os.listdir(directory) if os.path.isdir(directory) else []
+    for name in names:
+        if not (name.startswith(prefix) and name.endswith(suffix)):
+            continue
+        stored, table = load_table(os.path.join(directory, name))
+        if len(stored) != len(prob):
+            continue
+        distance = np.abs(np.subtract(stored, prob)).sum()
+        if distance <= best_distance:
+            best, best_distance = table, distance
+    return best
+
+def get_q_table(world, prob=DEFAULT_PROB, role="chase", directory=POLICY_DIR, warm_start=False):
+    """
+    Returns the Q-values of one of the ROLES MDPs of world and prob (see planners.mdp.solve_role).
+    Tables are kept in a least recently used cache keyed by (world hash, prob, role), and
+    memory-mapped from the table stored on disk, so that runs, agents and processes share them.
+    Missing tables are solved and stored. With warm_start they are solved from the values of
+    the nearest stored slip probabilities (see nearest_table), which is faster but makes the
+    result depend on the tables already stored, within the tolerance of the solve.
+    """
+    key = cache_key(world, prob, role)
+    table = _tables.get(key)
+    if table is not None:
+        _tables.move_to_end(key)
+        return table
+
+    path = table_path(key, directory)
+    # the probabilities stored in the file have to be exactly the ones asked for
+    if not os.path.exists(path) or load_table(path)[0] != key[1]:
+        nearest = nearest_table(world, prob, role, directory) if warm_start else None
+        V = None if nearest is None else nearest.max(axis=2)
+        save_table(path, solve_role(world, prob, role, V=V), key[1])
+    table = load_table(path)[1]
+    _tables[key] = table
+    if len(_tables) > TABLE_CACHE_SIZE:
+        _tables.popitem(last=False)
+    return table
+
+def get_policy(world, prob=DEFAULT_PROB, directory=POLICY_DIR, warm_start=False):
+    """The MDPPolicy of world and prob from the cached chase and evade tables"""
+    chase, evade = (get_q_table(world, prob, role, directory, warm_start) for role in ROLES)
+    return MDPPolicy(free_states(world), np.asarray(world).shape[1], chase, evade)
@@ -1,45 +1,25 @@
 import numpy as np
 from typing import List, Tuple, Optional
 
-def dfs(grid, start, end):
-    """A DFS example"""
-    rows, cols = len(grid), len(grid[0])
-    stack = [start]
-    visited = set()
-    parent = {start: None}
-
-    # Consider all 8 possible moves (up, down, left, right, and diagonals)
-    directions = [(-1, 0), (1, 0), (0, -1), (0, 1),  # Up, Down, Left, Right
-                  (-1, -1), (-1, 1), (1, -1), (1, 1)]  # Diagonal moves
-
-    while stack:
-        x, y = stack.pop()
-        if (x, y) == end:
-            # Reconstruct the path
-            path = []
-            while (x, y) is not None:
-                path.append((x, y))
-                if parent[(x, y)] is None:
-                    break  # Stop at the start node
-                x, y = parent[(x, y)]
-            return path[::-1]  # Return reversed path
-
-        if (x, y) in visited:
-            continue
-        visited.add((x, y))
-
-        for dx, dy in directions:
-            nx, ny = x + dx, y + dy
-            if 0 <= nx < rows and 0 <= ny < cols and grid[nx][ny] == 0 and (nx, ny) not in visited:
-                stack.append((nx, ny))
-                parent[(nx, ny)] = (x, y)
-
-    return None
+from planners.distances import get_table
+from planners.mdp import DEFAULT_PROB
+from planners.policies import get_policy
 
 class PlannerAgent:
     
     def __init__(self):
-        pass
+        self.np_rng = np.random
+        self.prob = DEFAULT_PROB
+        self.policy = None
+        self.policy_world = None
+
+    def set_rng(self, rng, np_rng):
+        """Uses the given numpy generator instead of the global one, the python one is not needed"""
+        self.np_rng = np_rng
+
+    def set_prob(self, prob):
+        """The slip probabilities of the task, the MDP policy is solved for them"""
+        self.prob = tuple(prob)
     
     def plan_action(self, world: np.ndarray, current: np.ndarray, pursued: np.ndarray, pursuer: np.ndarray) -> Optional[np.ndarray]:
         """
@@ -62,19 +42,19 @@ class PlannerAgent:
         directions = np.array([[0,0], [-1, 0], [1, 0], [0, -1], [0, 1],
                                    [-1, -1], [-1, 1], [1, -1], [1, 1]]) 
           
-        # Ensure start and end positions are tuples of integers
-        start = (int(current[0]), int(current[1]))
-        end = (int(pursued[0]), int(pursued[1]))
-
-        # Convert the numpy array to a list of lists for compatibility with the example DFS function
-        world_list: List[List[int]] = world.tolist()
-
-        # Perform DFS pathfinding and return the result as a numpy array
-        path = dfs(world_list, start, end)
-
-        try:
-            return np.array(path)[1]-current
-        except:
-            return directions[np.random.choice(9)]
+        # the chase and evade MDPs of the grid, shared through the policy cache
+        if self.policy is None or self.policy_world is not world:
+            self.policy = get_policy(world, self.prob)
+            self.policy_world = world
+        action = self.policy.action(current, pursued, pursuer)
+        if action is not None:
+            return directions[action]
+
+        # First move of a shortest path to the pursued, looked up in the grid's all-pairs table
+        action = get_table(world).action(current, pursued)
+
+        if action is None:
+            return directions[self.np_rng.choice(9)]
+        return action
 
 
@@ -1,6 +1,9 @@
 import numpy as np
 from typing import List, Tuple, Optional
 
+from planners.mdp import DEFAULT_PROB
+from planners.policies import get_policy
+
 def dfs(grid, start, end):
     """A DFS example"""
     rows, cols = len(grid), len(grid[0])
@@ -39,7 +42,18 @@ def dfs(grid, start, end):
 class PlannerAgent:
 	
 	def __init__(self):
-		pass
+		self.np_rng = np.random
+		self.prob = DEFAULT_PROB
+		self.policy = None
+		self.policy_world = None
+
+	def set_rng(self, rng, np_rng):
+		"""Uses the given numpy generator instead of the global one, the python one is not needed"""
+		self.np_rng = np_rng
+
+	def set_prob(self, prob):
+		"""The slip probabilities of the task, the MDP policy is solved for them"""
+		self.prob = tuple(prob)
 	
 	def plan_action(self, world: np.ndarray, current: np.ndarray, pursued: np.ndarray, pursuer: np.ndarray) -> Optional[np.ndarray]:
 		"""
@@ -62,6 +76,14 @@ class PlannerAgent:
 		directions = np.array([[0,0], [-1, 0], [1, 0], [0, -1], [0, 1],
                   	  		   [-1, -1], [-1, 1], [1, -1], [1, 1]]) 
 
-		return directions[np.random.choice(9)]
+		# the chase and evade MDPs of the grid, shared through the policy cache
+		if self.policy is None or self.policy_world is not world:
+			self.policy = get_policy(world, self.prob)
+			self.policy_world = world
+		action = self.policy.action(current, pursued, pursuer)
+
+		if action is None:
+			return directions[self.np_rng.choice(9)]
+		return directions[action]
 
 
@@ -0,0 +1,27 @@
+import argparse
+import time
+import numpy as np
+
+from planners.distances import save_table
+from planners.mdp import ROLES
+from planners.policies import get_q_table
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the all-pairs distance and next-hop tables of the grids")
+    parser.add_argument("--ids", type=int, nargs="+", default=list(range(100)))
+    parser.add_argument("--policies", action="store_true", help="also solve and store the MDP policies of the grids")
+    parser.add_argument("--prob", type=float, nargs=3, default=[0.3, 0.3, 0.4])
+    parser.add_argument("--warm-start", action="store_true",
+                        help="solve the policies from the stored ones of the closest slip probabilities")
+    args = parser.parse_args()
+
+    for id in args.ids:
+        t0 = time.perf_counter()
+        world = np.load("data/grid_files/grid_"+str(id)+".npy")
+        built = save_table(id, world)
+        print ("Grid %d: %s (%.2fs)" % (id, "built" if built else "up to date", time.perf_counter() - t0))
+        if args.policies:
+            t0 = time.perf_counter()
+            for role in ROLES:
+                get_q_table(world, args.prob, role, warm_start=args.warm_start)
+            print ("Grid %d: policies for prob %s (%.2fs)" % (id, args.prob, time.perf_counter() - t0))
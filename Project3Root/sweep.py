@@ -0,0 +1,96 @@
+import argparse
+import os
+import time
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from tournament import AGENTS, run_task
+
+# Finished games are stored as data/sweep/seed<seed>_<p1>_<p2>_<p3>.csv, one row per game
+SWEEP_DIR = "data/sweep"
+COLUMNS = ["id", "running_id"] + AGENTS
+
+def slip_prob(slip):
+    """Slip probabilities rotating the action with probability slip, half to each side"""
+    return (slip / 2, 1 - slip, slip / 2)
+
+def prob_label(prob):
+    return "-".join("%g" % p for p in prob)
+
+def results_path(prob, seed, directory=SWEEP_DIR):
+    # the exact probabilities, so that distinct ones never share a file
+    return os.path.join(directory, "seed" + str(seed) + "_" + "_".join(repr(float(p)) for p in prob) + ".csv")
+
+def load_results(path):
+    """The finished games of one prob, a game cut short by an interrupted write is dropped"""
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=COLUMNS, dtype=int)
+    games = pd.read_csv(path, names=COLUMNS, on_bad_lines="skip").dropna()
+    return games.astype(int).drop_duplicates(["id", "running_id"], keep="last")
+
+def run_sweep(probs, ids, runs=5, workers=None, base_seed=0, directory=SWEEP_DIR):
+    """
+    Plays the tournament of ids x runs for every slip probability vector in probs over one
+    pool of worker processes. Every finished game is appended to the results file of its
+    prob right away, and games already in the files are not played again, so an
+    interrupted sweep resumes where it stopped. The files have to be removed by hand
+    when the agents change.
+
+    Returns a dict from prob to the int array of run_tournament, one row
+    (id, running_id, Tom, Jerry, Spike) per game.
+    """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    done = {prob: load_results(results_path(prob, base_seed, directory)) for prob in probs}
+    # run by run, so that workers starting together play different grids and do not
+    # solve the same MDP policies (see planners.policies) at the same time
+    todo = [(prob, id, running_id) for prob in probs for running_id in range(runs) for id in ids
+            if not ((done[prob]["id"] == id) & (done[prob]["running_id"] == running_id)).any()]
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(run_task, id, running_id, base_seed, {"prob": list(prob)}, True): prob
+                       for prob, id, running_id in todo}
+            for future in as_completed(futures):
+                id, running_id, points, _, _ = future.result()
+                with open(results_path(futures[future], base_seed, directory), "a") as f:
+                    f.write(",".join(str(int(v)) for v in [id, running_id] + list(points)) + "\n")
+
+    results = {}
+    for prob in probs:
+        games = load_results(results_path(prob, base_seed, directory))
+        games = games[games["id"].isin(ids) & (games["running_id"] < runs)]
+        results[prob] = games.sort_values(["id", "running_id"]).to_numpy()
+    return results
+
+def summarize_sweep(results):
+    """Mean points and wins of every agent, one row per prob"""
+    rows = []
+    for prob, games in results.items():
+        points = games[:, 2:]
+        row = {"prob": prob_label(prob), "games": len(games)}
+        row.update({agent: points[:, i].mean() for i, agent in enumerate(AGENTS)})
+        row.update({agent + "_wins": (points[:, i] == 3).sum() for i, agent in enumerate(AGENTS)})
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the tournament over a range of slip probabilities")
+    parser.add_argument("--slips", type=float, nargs="+", default=[0.0, 0.2, 0.4, 0.6, 0.8],
+                        help="probabilities of rotating an action, split evenly between left and right")
+    parser.add_argument("--probs", nargs="+", help="explicit left,kept,right vectors instead of --slips, e.g. 0.3,0.3,0.4")
+    parser.add_argument("--ids", type=int, nargs="+", default=list(range(100)))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dir", default=SWEEP_DIR, help="directory of the cached results")
+    args = parser.parse_args()
+
+    if args.probs:
+        probs = [tuple(float(p) for p in prob.split(",")) for prob in args.probs]
+    else:
+        probs = [slip_prob(slip) for slip in args.slips]
+
+    t0 = time.perf_counter()
+    results = run_sweep(probs, args.ids, args.runs, args.workers, args.seed, args.dir)
+    print(summarize_sweep(results).to_string(index=False, float_format="%.3f"))
+    print ("%d probs in %.1fs with %d workers" % (len(probs), time.perf_counter() - t0, args.workers))
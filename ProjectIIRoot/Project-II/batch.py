@@ -0,0 +1,133 @@
+import argparse
+import time
+import numpy as np
+
+from main import OBSTACLE, OUTSIDE
+from planners.distances import DIRECTIONS, get_table
+
+# points of (no winner, Tom, Jerry, Spike winning)
+POINTS = np.array([[1, 1, 1], [3, 0, 0], [0, 3, 0], [0, 0, 3]])
+
+class RandomPolicy:
+    """Picks one of the 9 actions uniformly at random"""
+
+    def __init__(self, seed=None):
+        self.np_rng = np.random.default_rng(seed)
+
+    def plan_actions(self, world, current, pursued, pursuer):
+        return DIRECTIONS[self.np_rng.integers(len(DIRECTIONS), size=len(current))]
+
+class GreedyPolicy:
+    """Takes the first step of a shortest path to the pursued, staying in place if there is none"""
+
+    def __init__(self):
+        self.table = None
+        self.world = None
+
+    def plan_actions(self, world, current, pursued, pursuer):
+        if self.table is None or self.world is not world:
+            self.table = get_table(world)
+            self.world = world
+        cols = self.table.cols
+        a = self.table.next_hop[current[:, 0] * cols + current[:, 1], pursued[:, 0] * cols + pursued[:, 1]]
+        return DIRECTIONS[np.maximum(a, 0)]
+
+def as_policy(policy):
+    """The plan_actions of a vectorized agent, or the policy itself if it is a plain function"""
+    return policy.plan_actions if hasattr(policy, "plan_actions") else policy
+
+class BatchTask:
+    """
+    Plays batch_size games of one grid at once with the rules of Task, keeping the state of
+    all games as a (batch_size, 3, 2) int array of the (row, column) positions of Tom,
+    Jerry and Spike. Bounds, collisions and wins are whole-array operations.
+
+    The agents are vectorized policies, objects with a plan_actions method or plain functions
+    with its signature: (world, current, pursued, pursuer) with (B, 2) position arrays of the
+    B running games, returning their (B, 2) actions.
+    """
+    def __init__(self, id, batch_size, policies=None,
+                 max_iter=1000, seed=None):
+        self.id = id
+        self.batch_size = batch_size
+        self.max_iter = max_iter
+
+        self.world = np.load("data/grid_files/grid_"+str(id)+".npy")
+        self.padded_world = np.pad(self.world.astype(np.int8), 1, constant_values=OUTSIDE)
+        self.free = np.argwhere(self.world == 0)
+
+        self.np_rng = np.random.default_rng(np.random.SeedSequence(None if seed is None else [seed, id]))
+        if policies is None:
+            policies = [GreedyPolicy() for _ in range(3)]
+        self.policies = [as_policy(policy) for policy in policies]
+
+    def reset(self):
+        """
+        Places the agents of every game like select_valid_locations does: each one on a free
+        cell at Manhattan distance 3 or more from the ones placed before it
+        """
+        B = self.batch_size
+        self.state = np.zeros((B, 3, 2), dtype=int)
+        for i in range(3):
+            redo = np.arange(B)
+            while len(redo):
+                self.state[redo, i] = self.free[self.np_rng.integers(len(self.free), size=len(redo))]
+                near = np.abs(self.state[redo, :i] - self.state[redo, i, None]).sum(axis=2) < 3
+                redo = redo[near.any(axis=1)]
+        self.running = np.ones(B, dtype=bool)
+        # steps played and final points of every game
+        self.steps = np.zeros(B, dtype=int)
+        self.points = np.zeros((B, 3), dtype=int)
+
+    def step(self):
+        """Plays one step of every running game, returns the indices of the games that ended"""
+        games = np.flatnonzero(self.running)
+        state = self.state[games]
+        actions = np.stack([self.policies[i](self.world, state[:, i], state[:, (i+1) % 3], state[:, (i+2) % 3])
+                            for i in range(3)], axis=1)
+
+        # Task.check_actions: unit moves that stay in bounds, invalid actions leave the agent in place
+        is_valid = np.all(np.abs(actions) <= 1, axis=2)
+        moved = state + actions * is_valid[..., None]
+        is_valid &= self.padded_world[moved[..., 0]+1, moved[..., 1]+1] != OUTSIDE
+        state += actions * is_valid[..., None]
+        self.state[games] = state
+        self.steps[games] += 1
+
+        collisions = self.padded_world[state[..., 0]+1, state[..., 1]+1] == OBSTACLE
+        wins = np.all(state == np.roll(state, -1, axis=1), axis=2) & ~collisions
+        ended = wins.any(axis=1) | collisions.any(axis=1) | (self.steps[games] + 1 == self.max_iter)
+
+        # a single winner takes 3 points, otherwise agents that collided get 0 and the others 1
+        single = wins.sum(axis=1) == 1
+        points = np.where(single[:, None], POINTS[np.argmax(wins, axis=1) + 1], 1 - collisions)
+        self.points[games[ended]] = points[ended]
+        self.running[games[ended]] = False
+        return games[ended]
+
+    def run(self):
+        """Plays all games to the end, returns their points as a (batch_size, 3) int array"""
+        self.reset()
+        while self.running.any():
+            self.step()
+        return self.points
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play many games per grid with the vectorized game engine")
+    parser.add_argument("--ids", type=int, nargs="+", default=list(range(100)))
+    parser.add_argument("--batch-size", type=int, default=4096)
+    parser.add_argument("--policy", choices=["greedy", "random"], default="greedy")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    make = {"greedy": GreedyPolicy, "random": lambda: RandomPolicy(args.seed)}[args.policy]
+    totals = np.zeros(3, dtype=int)
+    steps = 0
+    t0 = time.perf_counter()
+    for id in args.ids:
+        T = BatchTask(id, args.batch_size, [make() for _ in range(3)], seed=args.seed)
+        totals += T.run().sum(axis=0)
+        steps += T.steps.sum()
+    elapsed = time.perf_counter() - t0
+    print ("Points Tom %d, Jerry %d, Spike %d" % tuple(totals))
+    print ("%d games, %d steps in %.1fs: %.0f steps/s" % (len(args.ids) * args.batch_size, steps, elapsed, steps / elapsed))
@@ -0,0 +1,185 @@
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+from gamelog import GameLogBuffer
+from planners.tom import PlannerAgent as QLearningAgent
+from planners.jerry import (NONE, MCTSTree, ParallelMCTS, TranspositionMCTS, legal_moves, legal_table,
+                            mcts_search, rollout, rollout_batch)
+
+def start_state(world, rng):
+    """Three distinct free cells"""
+    free = np.argwhere(world == 0)
+    return free[rng.choice(len(free), 3, replace=False)]
+
+def bench_qlearning(world, positions, seed=0):
+    """Times the training of the Q-learning agent and measures the size of its Q-table"""
+    agent = QLearningAgent()
+    agent.set_rng(random.Random(seed), np.random.default_rng(seed))
+    agent.set_world(world)
+    state = tuple(agent.cell(p) for p in positions)
+
+    t0 = time.perf_counter()
+    for _ in range(100):
+        agent.play_game(state)
+    single = 100 / (time.perf_counter() - t0)
+
+    agent = QLearningAgent()
+    agent.set_rng(random.Random(seed), np.random.default_rng(seed))
+    agent.set_world(world)
+    t0 = time.perf_counter()
+    agent.train(state)
+    elapsed = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        agent.choose_action(state, 0)
+    choose = (time.perf_counter() - t0) / 1000
+
+    print ("Q-learning: %.0f episodes/s one at a time, %.0f episodes/s in batches of %d"
+           % (single, agent.episodes / elapsed, agent.batch_size))
+    print ("Q-learning: %.0f updates/s, %d updates in %.2fs, %d states in a %.1f MB table, %.1f us/action"
+           % (agent.updates / elapsed, agent.updates, elapsed, len(agent.Q), agent.Q.nbytes / 1e6, choose * 1e6))
+
+def peak_memory(f):
+    """Peak python memory allocated while running f, measured separately because tracing slows f down"""
+    tracemalloc.start()
+    f()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+def bench_mcts(world, positions, seed=0, simulations=2000):
+    """Compares the simulations per second and memory of the Node tree, the array-backed tree and the graph MCTS"""
+    def node_search():
+        mcts_search(world, [tuple(p) for p in positions], (0, tuple(positions[0])), simulations, rng=random.Random(seed))
+
+    def tree_search():
+        tree = MCTSTree(world, rng=random.Random(seed))
+        tree.reset(tuple(tree.cell(p) for p in positions))
+        tree.search(simulations)
+        return tree
+
+    def graph_search():
+        graph = TranspositionMCTS(world, rng=random.Random(seed))
+        graph.search(tuple(graph.cell(p) for p in positions), simulations)
+        return graph
+
+    for name, search in [("Node", node_search), ("MCTSTree", tree_search), ("TranspositionMCTS", graph_search)]:
+        t0 = time.perf_counter()
+        search()
+        elapsed = time.perf_counter() - t0
+        print ("MCTS %-17s: %.0f simulations/s, peak memory %.2f MB"
+               % (name, simulations / elapsed, peak_memory(search) / 1e6))
+
+    tree = tree_search()
+    keys = ((tree.states[:len(tree), 0] * world.size + tree.states[:len(tree), 1]) * world.size
+            + tree.states[:len(tree), 2]) * 3 + tree.player[:len(tree)]
+    print ("MCTSTree: %d nodes for %d unique states, %.0f bytes per unique state"
+           % (len(tree), len(np.unique(keys)), tree.nbytes * len(tree) / len(tree.visits) / len(np.unique(keys))))
+    graph = graph_search()
+    # every node is a unique state: a slot of the arrays plus a dict entry holding an int key
+    index = (sys.getsizeof(graph.index) + sum(sys.getsizeof(key) for key in graph.index)) / len(graph)
+    print ("TranspositionMCTS: %d nodes, %.0f bytes per unique state (%.0f of arrays, %.0f of index)"
+           % (len(graph), graph.nbytes / len(graph.keys) + index, graph.nbytes / len(graph.keys), index))
+
+def bench_mcts_reuse(world, positions, seed=0, grids=range(5), runs=2, max_iter=200):
+    """Plays the same games with Jerry searching a fresh tree, a reused tree and the graph of states every move"""
+    from main import Task
+    for name, reuse, transpositions in [("fresh tree", False, False), ("reused tree", True, False), ("graph", True, True)]:
+        points = []
+        t0 = time.perf_counter()
+        for id in grids:
+            for running_id in range(runs):
+                T = Task(id, running_id, max_iter=max_iter, seed=seed, log_store=GameLogBuffer())
+                T.agents[1].reuse = reuse
+                T.agents[1].transpositions = transpositions
+                points.append(T.run())
+        points = np.array(points)
+        print ("MCTS %-11s: Jerry %d points, %d wins in %d games (%.1fs)"
+               % (name, points[:, 1].sum(), (points[:, 1] == 3).sum(), len(points), time.perf_counter() - t0))
+
+def bench_mcts_parallel(world, positions, seed=0, seconds=1.0):
+    """Root parallel MCTS with a time budget per move, with one and several rollouts per leaf"""
+    tree = MCTSTree(world, rng=random.Random(seed))
+    state = tuple(tree.cell(p) for p in positions)
+    tree.reset(state)
+    done = tree.search(deadline=time.perf_counter() + seconds)
+    print ("MCTS serial              : %6d simulations, %.0f simulations/s" % (done, done / seconds))
+    for workers in sorted({1, 2, os.cpu_count()}):
+        for leaf_rollouts in [1, 4]:
+            search = ParallelMCTS(world, workers, leaf_rollouts, random.Random(seed))
+            visits = search.search(state, seconds=seconds)
+            print ("MCTS %d workers, %d rollouts: %6d simulations, %.0f simulations/s per core, action %d"
+                   % (workers, leaf_rollouts, search.simulations, search.rate_per_core(), np.argmax(visits)))
+            search.close()
+
+def bench_rollouts(world, positions, seed=0, n=20000, rounds=50):
+    """Random rollouts per second, one at a time and with the vectorized kernel, and batched MCTS leaf evaluation"""
+    offsets, legal = legal_moves(world)
+    counts, actions = legal_table(world)
+    state = [int(p[0]) * world.shape[1] + int(p[1]) for p in positions]
+    rng = random.Random(seed)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        rollout(state, 0, NONE, offsets, legal, rounds, rng)
+    print ("Rollouts one at a time : %.0f rollouts/s" % (n / (time.perf_counter() - t0)))
+    for batch in [16, 256, 4096]:
+        np_rng = np.random.default_rng(seed)
+        t0 = time.perf_counter()
+        for _ in range(n // batch):
+            rollout_batch(np.tile(state, (batch, 1)), np.zeros(batch, dtype=int), np.full(batch, NONE),
+                          np.array(offsets), counts, actions, rounds, np_rng)
+        print ("Rollouts in batches of %4d: %.0f rollouts/s" % (batch, n // batch * batch / (time.perf_counter() - t0)))
+
+    for leaf_batch, leaf_rollouts in [(1, 1), (1, 4), (16, 1), (64, 1), (256, 1), (16, 16)]:
+        tree = MCTSTree(world, rng=random.Random(seed), leaf_batch=leaf_batch, leaf_rollouts=leaf_rollouts,
+                        np_rng=np.random.default_rng(seed))
+        tree.reset(tuple(state))
+        t0 = time.perf_counter()
+        done = tree.search(2000)
+        elapsed = time.perf_counter() - t0
+        print ("MCTSTree leaf_batch=%3d leaf_rollouts=%2d: %.0f simulations/s, %.0f rollouts/s"
+               % (leaf_batch, leaf_rollouts, done / elapsed, done * leaf_rollouts / elapsed))
+
+def bench_deadline(world, positions, seed=0, budget=0.05, tolerance=0.005, grids=range(8), runs=2, max_iter=200, workers=2):
+    """
+    Plays games with a time budget per decision for Tom, whose training is spread over its
+    moves, and then for Jerry searching root parallel trees in workers processes, and checks
+    that no decision takes longer than the budget plus tolerance
+    """
+    from main import Task
+    for agent, name in [(0, "Q-learning"), (1, "Parallel MCTS")]:
+        time_budget = [None, None, None]
+        time_budget[agent] = budget
+        worst = 0.0
+        for id in grids:
+            for running_id in range(runs):
+                T = Task(id, running_id, max_iter=max_iter, seed=seed, log_store=GameLogBuffer(), time_budget=time_budget)
+                if agent == 0:
+                    T.agents[1].simulations = 10
+                else:
+                    T.agents[1].workers = workers
+                T.run()
+                worst = max(worst, T.latency_stats()[2, agent])
+        print ("%s with a %.0f ms budget: %.1f ms max decision time" % (name, budget * 1000, worst * 1000))
+        assert worst <= budget + tolerance, "%s took %.1f ms, over the %.0f ms budget" % (name, worst * 1000, budget * 1000)
+
+BENCHMARKS = {"qlearning": bench_qlearning, "mcts": bench_mcts, "mcts_reuse": bench_mcts_reuse,
+              "mcts_parallel": bench_mcts_parallel, "rollouts": bench_rollouts, "deadline": bench_deadline}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the planners")
+    parser.add_argument("benchmarks", nargs="*", default=list(BENCHMARKS))
+    parser.add_argument("--grid", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    world = np.load("data/grid_files/grid_"+str(args.grid)+".npy")
+    positions = start_state(world, np.random.default_rng(args.seed))
+    for name in args.benchmarks:
+        BENCHMARKS[name](world, positions, args.seed)
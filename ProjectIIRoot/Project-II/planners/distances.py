@@ -0,0 +1,197 @@
+import glob
+import hashlib
+import os
+import numpy as np
+from collections import OrderedDict
+
+# The 9 actions of the game, index 0 is staying in place
+DIRECTIONS = np.array([[0,0], [-1, 0], [1, 0], [0, -1], [0, 1],
+                       [-1, -1], [-1, 1], [1, -1], [1, 1]])
+
+UNREACHABLE = -1
+
+def distance_field(world, sources):
+    """
+    Computes the number of 8-connected moves from each source to every free
+    cell with a vectorized wavefront, one array step per distance level.
+
+    Parameters:
+    - world (np.ndarray): the grid, 0 is walkable and 1 is an obstacle.
+    - sources (np.ndarray): a single (row, column) position, or K of them as a K x 2 array.
+
+    Returns:
+    - np.ndarray: int16 distances of shape world.shape, or K x world.shape for
+      several sources, with UNREACHABLE for cells that cannot be reached.
+    """
+    free = np.asarray(world) == 0
+    sources = np.asarray(sources)
+    single = sources.ndim == 1
+    sources = sources.reshape(-1, 2)
+    k = len(sources)
+    rows, cols = free.shape
+
+    dist = np.full((k, rows, cols), UNREACHABLE, dtype=np.int16)
+    frontier = np.zeros((k, rows + 2, cols + 2), dtype=bool)
+    frontier[np.arange(k), sources[:, 0] + 1, sources[:, 1] + 1] = True
+    unvisited = np.repeat(free[None], k, axis=0)
+    unvisited[np.arange(k), sources[:, 0], sources[:, 1]] = False
+
+    d = 0
+    while True:
+        dist[frontier[:, 1:-1, 1:-1]] = d
+        # the 3x3 neighborhood is separable: dilate along the rows, then along the columns
+        grown = frontier[:, :-2] | frontier[:, 1:-1] | frontier[:, 2:]
+        grown = grown[:, :, :-2] | grown[:, :, 1:-1] | grown[:, :, 2:]
+        grown &= unvisited
+        if not grown.any():
+            break
+        unvisited &= ~grown
+        frontier[:, 1:-1, 1:-1] = grown
+        d += 1
+
+    return dist[0] if single else dist
+
+def step_towards(dist, current):
+    """
+    Returns the action that moves from current one step down the distance field,
+    i.e. along a shortest path to the field's source, or None if it cannot be reached.
+    """
+    rows, cols = dist.shape
+    d = dist[current[0], current[1]]
+    if d == UNREACHABLE:
+        return None
+    if d == 0:
+        return DIRECTIONS[0]
+    for action in DIRECTIONS:
+        nx, ny = current[0] + action[0], current[1] + action[1]
+        if 0 <= nx < rows and 0 <= ny < cols and dist[nx, ny] == d - 1:
+            return action
+
+def world_key(world):
+    """A hash of the grid contents, used as the key of the table caches"""
+    world = np.ascontiguousarray(world)
+    return hashlib.sha1(str(world.shape).encode() + world.tobytes()).hexdigest()
+
+def all_pairs(world):
+    """
+    Computes the shortest distances and next-hop actions between all pairs of cells.
+
+    Cells are indexed as row * cols + column. Returns two arrays of shape
+    (cells, cells): int16 distances (UNREACHABLE if there is no path) and
+    int8 indices into DIRECTIONS of the first move of a shortest path from
+    the first cell to the second one (-1 if there is no path).
+    """
+    world = np.asarray(world)
+    rows, cols = world.shape
+    cells = np.argwhere(np.ones((rows, cols), dtype=bool))
+    dist = distance_field(world, cells).reshape(rows * cols, rows * cols)
+
+    next_hop = np.full(dist.shape, -1, dtype=np.int8)
+    next_hop[dist == 0] = 0
+    free = (world == 0).ravel()
+    for a in range(1, len(DIRECTIONS)):
+        nx = cells[:, 0] + DIRECTIONS[a][0]
+        ny = cells[:, 1] + DIRECTIONS[a][1]
+        valid = (nx >= 0) & (nx < rows) & (ny >= 0) & (ny < cols)
+        neighbor = np.where(valid, nx * cols + ny, 0)
+        valid &= free[neighbor]
+        # moving to the neighbor gets one step closer to every target it is nearer to
+        closer = valid[:, None] & (dist > 0) & (dist[neighbor] == dist - 1) & (next_hop == -1)
+        next_hop[closer] = a
+    return dist, next_hop
+
+class DistanceTable:
+    """All-pairs shortest distances and next-hop actions of one grid"""
+
+    def __init__(self, dist, next_hop, cols):
+        self.dist = dist
+        self.next_hop = next_hop
+        self.cols = cols
+
+    def index(self, pos):
+        return int(pos[0]) * self.cols + int(pos[1])
+
+    def distance(self, source, target):
+        """Number of moves from source to target, UNREACHABLE if there is no path"""
+        return int(self.dist[self.index(source), self.index(target)])
+
+    def action(self, source, target):
+        """The first action of a shortest path from source to target, None if there is no path"""
+        a = self.next_hop[self.index(source), self.index(target)]
+        return DIRECTIONS[a] if a >= 0 else None
+
+_tables = OrderedDict()
+TABLE_CACHE_SIZE = 8
+
+# Precomputed tables are stored next to the grids as grid_<id>.<key>.dist.npy and .next.npy
+ARTIFACT_DIR = "data/grid_files"
+KEY_LENGTH = 16
+
+def artifact_prefix(id, key, directory=ARTIFACT_DIR):
+    return os.path.join(directory, "grid_" + str(id) + "." + key[:KEY_LENGTH])
+
+def _save_npy(path, array):
+    """Writes through a temporary file so that readers never map a partial artifact"""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+def save_table(id, world, directory=ARTIFACT_DIR):
+    """
+    Builds the tables of grid id and writes them to disk, removing artifacts
+    of the same grid that were built for different contents.
+    Returns True if the artifact was (re)built, False if it was up to date.
+    """
+    key = world_key(world)
+    prefix = artifact_prefix(id, key, directory)
+    stale = [path for path in glob.glob(os.path.join(directory, "grid_" + str(id) + ".*.npy"))
+             if not path.startswith(prefix + ".")]
+    for path in stale:
+        os.remove(path)
+    if os.path.exists(prefix + ".dist.npy") and os.path.exists(prefix + ".next.npy"):
+        return False
+
+    dist, next_hop = all_pairs(world)
+    _save_npy(prefix + ".dist.npy", dist)
+    _save_npy(prefix + ".next.npy", next_hop)
+    return True
+
+def load_table(world, key=None, directory=ARTIFACT_DIR):
+    """
+    Memory-maps the precomputed tables of world, so that processes share the
+    pages read-only. Returns None if no artifact matches the world's contents.
+    """
+    key = key or world_key(world)
+    matches = glob.glob(os.path.join(directory, "grid_*." + key[:KEY_LENGTH] + ".dist.npy"))
+    if not matches:
+        return None
+    prefix = matches[0][:-len(".dist.npy")]
+    if not os.path.exists(prefix + ".next.npy"):
+        return None
+    dist = np.load(prefix + ".dist.npy", mmap_mode="r")
+    next_hop = np.load(prefix + ".next.npy", mmap_mode="r")
+    cells = np.asarray(world).size
+    if dist.shape != (cells, cells) or next_hop.shape != (cells, cells):
+        return None
+    return DistanceTable(dist, next_hop, np.asarray(world).shape[1])
+
+def get_table(world):
+    """
+    Returns the DistanceTable of world, loading the precomputed artifact or
+    building it on first use. Tables are kept in a least recently used cache
+    keyed by world_key.
+    """
+    key = world_key(world)
+    table = _tables.get(key)
+    if table is None:
+        table = load_table(world, key)
+        if table is None:
+            dist, next_hop = all_pairs(world)
+            table = DistanceTable(dist, next_hop, np.asarray(world).shape[1])
+        _tables[key] = table
+        if len(_tables) > TABLE_CACHE_SIZE:
+            _tables.popitem(last=False)
+    else:
+        _tables.move_to_end(key)
+    return table
@@ -1,9 +1,17 @@
 import math
+import os
 import random
+import time
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 from typing import List, Tuple, Optional
 
+from planners.distances import world_key
+
+DIRECTIONS = np.array([[0,0], [-1, 0], [1, 0], [0, -1], [0, 1],
+                       [-1, -1], [-1, 1], [1, -1], [1, 1]])
+
 def get_all_legal_actions(world, state, current_player_num):
     all = []
     for i in range(len(state)):
@@ -49,8 +57,9 @@ def check_winner(state, player):
 
 # --- MCTS Node ---
 class Node:
-    def __init__(self, world, state, player, parent=None):
+    def __init__(self, world, state, player, parent=None, rng=random):
         self.world = world
+        self.rng = rng
         self.state = state
         self.player = player
         self.parent = parent
@@ -75,7 +84,7 @@ class Node:
                 next_state = apply_action(self.state, action, self.player)
                 next_player_num = (self.player[0]+1)%3
                 next_player = (next_player_num, self.state[next_player_num])
-                child = Node(self.world, next_state, next_player, parent=self)
+                child = Node(self.world, next_state, next_player, parent=self, rng=self.rng)
                 self.children[str_action] = child
                 return child
         return self  # fallback (shouldn’t happen)
@@ -91,7 +100,7 @@ class Node:
             actions = get_legal_actions(state, player)
             if i < rounds:
                 return 0
-            action = random.choice(actions)
+            action = self.rng.choice(actions)
             state = apply_action(state, action, player)
             player_num = (player[0]+1)%3
             player = (player_num, self.state[player_num])
@@ -113,8 +122,8 @@ class Node:
             node = node.parent
 
 # --- MCTS search ---
-def mcts_search(world, state, player, simulations=1000):
-    root = Node(world, state, player)
+def mcts_search(world, state, player, simulations=1000, rng=random):
+    root = Node(world, state, player, rng=rng)
     for _ in range(simulations):
         node = root
 
@@ -134,12 +143,586 @@ def mcts_search(world, state, player, simulations=1000):
 
     # Pick action with highest visit count
     return max(root.children.items(), key=lambda item: item[1].visits)[0]
+
+# --- Array-backed MCTS ---
+NONE = -1
+# points of the three players by winner + 1, nobody winning within the rollout counts as a tie
+POINTS = np.array([[1, 1, 1], [3, 0, 0], [0, 3, 0], [0, 0, 3]])
+
+def legal_mask(world):
+    """legal_mask[cell, a] is True if action a from cell stays inside the world and off obstacles"""
+    rows, cols = world.shape
+    padded = np.pad(world == 0, 1, constant_values=False)
+    return np.stack([padded[1+dx:rows+1+dx, 1+dy:cols+1+dy].ravel() for dx, dy in DIRECTIONS], axis=1)
+
+def legal_moves(world):
+    """
+    Returns (offsets, legal): moving by action a adds offsets[a] to a cell index
+    row * cols + column, and legal[cell] lists the legal actions from cell.
+    """
+    offsets = [int(dx * world.shape[1] + dy) for dx, dy in DIRECTIONS]
+    return offsets, [np.flatnonzero(mask).tolist() for mask in legal_mask(world)]
+
+def legal_table(world):
+    """
+    The legal actions of every cell as arrays for rollout_batch: counts[cell] is the
+    number of legal actions from cell and actions[cell, :counts[cell]] are their indices.
+    """
+    mask = legal_mask(world)
+    return mask.sum(axis=1), np.argsort(~mask, axis=1, kind="stable")
+
+def winner_after(state, mover):
+    """The winner once mover has moved to its cell of state, NONE if the game goes on"""
+    # the mover wins on its pursued's cell and loses on its pursuer's cell
+    if state[mover] == state[(mover+1)%3]:
+        return mover
+    if state[mover] == state[(mover-1)%3]:
+        return (mover-1)%3
+    return NONE
+
+def rollout(state, player, winner, offsets, legal, rounds, rng):
+    """Plays random moves from state for up to rounds moves, returns the points of the three players"""
+    state = list(state)
+    for _ in range(rounds):
+        if winner != NONE:
+            break
+        state[player] += offsets[rng.choice(legal[state[player]])]
+        winner = winner_after(state, player)
+        player = (player+1)%3
+    return POINTS[winner + 1]
+
+def rollout_batch(states, players, winners, offsets, counts, actions, rounds, rng):
+    """
+    Plays random moves from a batch of states at once, one move of every unfinished
+    rollout per array step, for up to rounds moves.
+
+    Parameters:
+    - states (np.ndarray): B x 3 cell indices, players (np.ndarray): the B players to move
+      and winners (np.ndarray): the B winners so far, NONE for running games.
+    - offsets (np.ndarray): the cell index offsets of the actions, counts and actions: see legal_table.
+    - rng: a numpy Generator (or np.random) drawing the moves.
+
+    Returns:
+    - np.ndarray: B x 3 points of the three players.
+    """
+    states = np.array(states, dtype=np.int64)
+    players = np.array(players, dtype=np.int64)
+    winners = np.array(winners, dtype=np.int64)
+    for _ in range(rounds):
+        active = np.flatnonzero(winners == NONE)
+        if not len(active):
+            break
+        player = players[active]
+        cells = states[active, player]
+        choice = (rng.random(len(active)) * counts[cells]).astype(np.int64)
+        moved = cells + offsets[actions[cells, choice]]
+        states[active, player] = moved
+        # the mover wins on its pursued's cell and loses on its pursuer's cell
+        winner = np.where(moved == states[active, (player+1)%3], player, NONE)
+        winners[active] = np.where(moved == states[active, (player-1)%3], (player-1)%3, winner)
+        players[active] = (player+1)%3
+    return POINTS[winners + 1]
+
+class MCTSTree:
+    """
+    MCTS with the tree held in preallocated numpy arrays instead of Node objects.
+
+    A state is a tuple of three cell indices row * cols + column, where player i
+    pursues player (i+1)%3 and the players move in turn. Node 0 is the root. A
+    node is expanded once it has been visited, all its children at once into the
+    block first_child .. first_child+num_children, one child per legal action of
+    the player to move. value sums the points of the player who moved into the
+    node, so every player picks its children by its own points.
+    The arrays double in size when they run full.
+
+    With leaf_batch > 1 a search selects that many leaves one after the other, each
+    counting as visited right away so that the next selections spread out (virtual
+    loss), and evaluates all of them together. leaf_rollouts sets the number of
+    rollouts per leaf. Rollouts are played by rollout_batch when there are at least
+    BATCH_ROLLOUTS of them at once, below that one at a time is faster.
+    """
+
+    ARRAYS = ["visits", "value", "parent", "first_child", "num_children", "action", "player", "winner", "states"]
+    BATCH_ROLLOUTS = 64
+
+    def __init__(self, world, capacity=1 << 12, c=1.41, rounds=50, rng=random, leaf_rollouts=1,
+                 leaf_batch=1, np_rng=np.random):
+        self.world = world
+        self.c = c             # exploration constant of UCB1
+        self.rounds = rounds   # moves per rollout
+        self.rng = rng
+        self.np_rng = np_rng   # draws the moves of batched rollouts
+        self.leaf_rollouts = leaf_rollouts   # rollouts from every leaf, each counts as a visit
+        self.leaf_batch = leaf_batch         # leaves evaluated together
+        self.cols = world.shape[1]
+        self.offsets, self.legal = legal_moves(world)
+        self.counts, self.actions = legal_table(world)
+
+        self.visits = np.zeros(capacity, dtype=np.int32)
+        self.value = np.zeros(capacity)
+        self.parent = np.full(capacity, NONE, dtype=np.int32)
+        self.first_child = np.full(capacity, NONE, dtype=np.int32)
+        self.num_children = np.zeros(capacity, dtype=np.int8)
+        self.action = np.full(capacity, NONE, dtype=np.int8)       # index into DIRECTIONS that led to the node
+        self.player = np.zeros(capacity, dtype=np.int8)            # player to move
+        self.winner = np.full(capacity, NONE, dtype=np.int8)       # winner if the node ends the game
+        self.states = np.zeros((capacity, 3), dtype=np.int32)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+
+    def cell(self, pos):
+        return int(pos[0]) * self.cols + int(pos[1])
+
+    def _grow(self, needed):
+        capacity = len(self.visits)
+        while capacity < needed:
+            capacity *= 2
+        for name in self.ARRAYS:
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def reset(self, state, player=0):
+        """Starts a new tree with the root at state"""
+        self.size = 1
+        self.visits[0] = 0
+        self.value[0] = 0
+        self.parent[0] = NONE
+        self.first_child[0] = NONE
+        self.num_children[0] = 0
+        self.action[0] = NONE
+        self.player[0] = player
+        self.winner[0] = NONE
+        self.states[0] = state
+
+    def find(self, state):
+        """
+        The node holding state one round below the root, reached by one move of each
+        player onto its cell of state. None if that part of the tree was never expanded.
+        """
+        if not self.size:
+            return None
+        node = 0
+        for _ in range(3):
+            player = self.player[node]
+            first = self.first_child[node]
+            n = self.num_children[node]
+            if not n:
+                return None
+            hit = np.flatnonzero(self.states[first:first+n, player] == state[player])
+            if not len(hit):
+                return None
+            node = first + hit[0]
+        return node
+
+    def reroot(self, state):
+        """
+        Keeps only the subtree below the node holding state, moved to the front of the
+        arrays with that node as the new root. Returns False, leaving the tree as it
+        is, if state was never expanded.
+        """
+        root = self.find(state)
+        if root is None:
+            return False
+        # breadth first order keeps the children of every node in one block
+        order = [np.array([root])]
+        level = order[0]
+        while True:
+            n = self.num_children[level].astype(np.int64)
+            level = level[n > 0]
+            if not len(level):
+                break
+            n = n[n > 0]
+            starts = np.repeat(self.first_child[level] - np.cumsum(n) + n, n)
+            level = starts + np.arange(n.sum())
+            order.append(level)
+        order = np.concatenate(order)
+
+        remap = np.full(self.size, NONE, dtype=np.int32)
+        remap[order] = np.arange(len(order))
+        for name in self.ARRAYS:
+            array = getattr(self, name)
+            array[:len(order)] = array[order]
+        self.size = len(order)
+        self.parent[0] = NONE
+        self.parent[1:self.size] = remap[self.parent[1:self.size]]
+        expanded = self.first_child[:self.size] != NONE
+        self.first_child[:self.size][expanded] = remap[self.first_child[:self.size][expanded]]
+        return True
+
+    def expand(self, node):
+        """Adds one child per legal action of the player to move at node"""
+        state = self.states[node]
+        player = int(self.player[node])
+        legal = self.legal[state[player]]
+        n = len(legal)
+        if self.size + n > len(self.visits):
+            self._grow(self.size + n)
+        first = self.size
+        block = slice(first, first + n)
+        self.size += n
+        self.first_child[node] = first
+        self.num_children[node] = n
+
+        self.visits[block] = 0
+        self.value[block] = 0
+        self.parent[block] = node
+        self.first_child[block] = NONE
+        self.num_children[block] = 0
+        self.action[block] = legal
+        self.player[block] = (player + 1) % 3
+        children = np.repeat(state[None], n, axis=0)
+        children[:, player] += np.take(self.offsets, legal)
+        self.states[block] = children
+        # the mover wins on its pursued's cell and loses on its pursuer's cell
+        moved = children[:, player]
+        winner = np.where(moved == children[:, (player+1)%3], player, NONE)
+        self.winner[block] = np.where(moved == children[:, (player-1)%3], (player-1)%3, winner)
+
+    def select(self):
+        """Descends by UCB1 to a leaf or an unvisited node, returns the path from the root"""
+        path = [0]
+        node = 0
+        while self.num_children[node]:
+            first = self.first_child[node]
+            visits = self.visits[first:first+self.num_children[node]]
+            unvisited = np.flatnonzero(visits == 0)
+            if len(unvisited):
+                node = first + unvisited[0]
+            else:
+                ucb = self.value[first:first+len(visits)] / visits + self.c * np.sqrt(np.log(self.visits[node]) / visits)
+                node = first + int(np.argmax(ucb))
+            path.append(node)
+        return path
+
+    def rollout(self, node):
+        return rollout(self.states[node].tolist(), int(self.player[node]), int(self.winner[node]),
+                       self.offsets, self.legal, self.rounds, self.rng)
+
+    def evaluate(self, leaves):
+        """The points of leaf_rollouts rollouts from each of the leaves, summed per leaf"""
+        leaves = np.repeat(leaves, self.leaf_rollouts)
+        if len(leaves) >= self.BATCH_ROLLOUTS:
+            points = rollout_batch(self.states[leaves], self.player[leaves], self.winner[leaves], np.array(self.offsets),
+                                   self.counts, self.actions, self.rounds, self.np_rng)
+        else:
+            points = np.array([self.rollout(leaf) for leaf in leaves])
+        return points.reshape(-1, self.leaf_rollouts, 3).sum(axis=1)
+
+    def backpropagate(self, path, points, visits=1):
+        path = np.array(path)
+        self.visits[path] += visits
+        self.value[path] += points[(self.player[path] - 1) % 3]
+
+    def search(self, simulations=None, deadline=None):
+        """
+        Runs simulations until either their number or the time.perf_counter() deadline
+        is reached, whichever is given first. Returns the number of simulations.
+        """
+        if self.leaf_batch > 1:
+            return self.search_batched(simulations, deadline)
+        done = 0
+        while (simulations is None or done < simulations) and (deadline is None or time.perf_counter() < deadline):
+            path = self.select_leaf()
+            if self.leaf_rollouts == 1:
+                self.backpropagate(path, self.rollout(path[-1]))
+            else:
+                self.backpropagate(path, self.evaluate([path[-1]])[0], self.leaf_rollouts)
+            done += 1
+        return done
+
+    def select_leaf(self):
+        """select, then expand the leaf if it has been visited before and step into one of its children"""
+        path = self.select()
+        node = path[-1]
+        if self.winner[node] == NONE and self.visits[node]:
+            self.expand(node)
+            path.append(self.first_child[node] + self.rng.randrange(self.num_children[node]))
+        return path
+
+    def search_batched(self, simulations=None, deadline=None):
+        """search with the leaves evaluated leaf_batch at a time, each leaf is one simulation"""
+        done = 0
+        while (simulations is None or done < simulations) and (deadline is None or time.perf_counter() < deadline):
+            paths = []
+            for _ in range(self.leaf_batch if simulations is None else min(self.leaf_batch, simulations - done)):
+                path = np.array(self.select_leaf())
+                # virtual loss: count the visits now, the points follow after the rollouts
+                self.visits[path] += self.leaf_rollouts
+                paths.append(path)
+            points = self.evaluate([path[-1] for path in paths])
+            for path, leaf_points in zip(paths, points):
+                self.value[path] += leaf_points[(self.player[path] - 1) % 3]
+            done += len(paths)
+        return done
+
+    def root_visits(self):
+        """The visits of the root's children by action, zero for illegal actions"""
+        visits = np.zeros(len(DIRECTIONS), dtype=np.int64)
+        first = self.first_child[0]
+        children = slice(first, first + self.num_children[0])
+        visits[self.action[children]] = self.visits[children]
+        return visits
+
+    def best_action(self):
+        """The most visited action at the root, as an index into DIRECTIONS"""
+        if not self.num_children[0]:
+            return 0
+        first = self.first_child[0]
+        children = slice(first, first + self.num_children[0])
+        return int(self.action[children][np.argmax(self.visits[children])])
+
+# --- MCTS with transpositions ---
+class TranspositionMCTS:
+    """
+    MCTS over a graph of states instead of a tree: a state reached through different
+    move orders is a single node, so all of them share its statistics.
+
+    Nodes are keyed by ((s0 * cells + s1) * cells + s2) * 3 + player, the cells of the
+    three players and the player to move, and their statistics are held in arrays of
+    a fixed capacity. When these are full, the half of the nodes that was used least
+    recently, then visited least, is evicted. The graph is kept from one search to
+    the next, so the simulations of earlier moves carry over to the states they reached.
+    """
+
+    ARRAYS = ["keys", "visits", "value", "last_used"]
+
+    def __init__(self, world, capacity=1 << 16, c=1.41, rounds=50, rng=random):
+        self.world = world
+        self.c = c             # exploration constant of UCB1
+        self.rounds = rounds   # moves per rollout
+        self.rng = rng
+        self.cols = world.shape[1]
+        self.cells = world.size
+        self.offsets, self.legal = legal_moves(world)
+
+        self.index = {}        # key -> node
+        self.keys = np.zeros(capacity, dtype=np.int64)
+        self.visits = np.zeros(capacity, dtype=np.int32)
+        self.value = np.zeros(capacity)        # points of the player who moved into the node
+        self.last_used = np.zeros(capacity, dtype=np.int32)
+        self.size = 0
+        self.searches = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+
+    def cell(self, pos):
+        return int(pos[0]) * self.cols + int(pos[1])
+
+    def encode(self, state, player):
+        return ((state[0] * self.cells + state[1]) * self.cells + state[2]) * 3 + player
+
+    def evict(self):
+        """Keeps the most recently used half of the nodes, the most visited among equally recent ones"""
+        keep = np.sort(np.lexsort((self.visits[:self.size], self.last_used[:self.size]))[self.size - len(self.keys) // 2:])
+        for name in self.ARRAYS:
+            array = getattr(self, name)
+            array[:len(keep)] = array[keep]
+        self.size = len(keep)
+        self.index = dict(zip(self.keys[:self.size].tolist(), range(self.size)))
+
+    def add(self, key):
+        node = self.size
+        self.size += 1
+        self.keys[node] = key
+        self.visits[node] = 0
+        self.value[node] = 0
+        self.index[key] = node
+        return node
+
+    def children(self, state, player):
+        """The actions of player and the states they lead to"""
+        cell = state[player]
+        children = []
+        for a in self.legal[cell]:
+            child = list(state)
+            child[player] = cell + self.offsets[a]
+            children.append(child)
+        return self.legal[cell], children
+
+    def simulate(self, state, player):
+        """Selection, expansion, rollout and backpropagation from the root at state"""
+        if self.size + 2 > len(self.keys):
+            self.evict()
+        key = self.encode(state, player)
+        node = self.index.get(key)
+        path = [self.add(key) if node is None else node]
+        on_path = set(path)
+        winner = NONE
+        while True:
+            _, children = self.children(state, player)
+            mover, player = player, (player+1)%3
+            keys = [self.encode(child, player) for child in children]
+            nodes = [self.index.get(key) for key in keys]
+            if None in nodes:
+                # expand the first child that is not in the graph yet
+                i = nodes.index(None)
+                state = children[i]
+                path.append(self.add(keys[i]))
+                winner = winner_after(state, mover)
+                break
+            visits = self.visits[nodes]
+            ucb = self.value[nodes] / visits + self.c * np.sqrt(np.log(max(self.visits[path[-1]], 1)) / visits)
+            i = int(np.argmax(ucb))
+            state = children[i]
+            winner = winner_after(state, mover)
+            if nodes[i] in on_path:
+                # the moves went round in a circle, evaluate the repeated state from here
+                break
+            path.append(nodes[i])
+            on_path.add(nodes[i])
+            if winner != NONE:
+                break
+
+        points = rollout(state, player, winner, self.offsets, self.legal, self.rounds, self.rng)
+        path = np.array(path)
+        self.visits[path] += 1
+        self.value[path] += points[(self.keys[path] % 3 - 1) % 3]
+        self.last_used[path] = self.searches
+
+    def search(self, state, simulations=None, player=0, deadline=None):
+        """Like MCTSTree.search, from the root at state"""
+        self.searches += 1
+        state = list(state)
+        done = 0
+        while (simulations is None or done < simulations) and (deadline is None or time.perf_counter() < deadline):
+            self.simulate(state, player)
+            done += 1
+        return done
+
+    def best_action(self, state, player=0):
+        """The most visited action from state, as an index into DIRECTIONS"""
+        actions, children = self.children(list(state), player)
+        visits = [self.visits[node] if node is not None else -1
+                  for node in (self.index.get(self.encode(child, (player+1)%3)) for child in children)]
+        return actions[int(np.argmax(visits))]
+
+# --- Root parallel MCTS ---
+# the tree of the last world searched in a worker process, kept for the next move
+_worker_tree = {}
+
+def _worker_tree_of(world):
+    """The tree of world in this worker process, also the initializer of the workers"""
+    key = world_key(world)
+    tree = _worker_tree.get(key)
+    if tree is None:
+        _worker_tree.clear()
+        tree = _worker_tree[key] = MCTSTree(world)
+    return tree
+
+def _root_search(world, state, simulations, deadline, seed, leaf_rollouts, leaf_batch):
+    """
+    Searches a fresh tree in a worker process, returns its root visits by action and its number of simulations.
+    The deadline is a time.perf_counter() time of the parent, the clock is the same system-wide monotonic one in all processes.
+    """
+    tree = _worker_tree_of(world)
+    tree.rng = random.Random(seed)
+    tree.np_rng = np.random.default_rng(seed)
+    tree.leaf_rollouts = leaf_rollouts
+    tree.leaf_batch = leaf_batch
+    tree.reset(state)
+    done = tree.search(simulations, deadline)
+    return tree.root_visits(), done
+
+class ParallelMCTS:
+    """
+    Root parallel MCTS: each of the worker processes searches its own tree from the
+    same root with its own seed, and the root visits of all trees are summed.
+    A search for seconds ends the workers' searches early by the margin it takes to
+    hand their results back, measured when the workers start and raised to the
+    largest one seen since.
+    """
+
+    def __init__(self, world, workers=None, leaf_rollouts=1, rng=random, leaf_batch=1):
+        self.world = world
+        self.workers = workers or os.cpu_count()
+        self.leaf_rollouts = leaf_rollouts
+        self.leaf_batch = leaf_batch
+        self.rng = rng
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_worker_tree_of, initargs=(world,))
+        # simulations of all workers and wall time of the last search
+        self.simulations = 0
+        self.elapsed = 0.0
+        # the first round trip starts the workers and builds their trees, the second one is the margin
+        self.round_trip()
+        self.margin = self.round_trip()
+
+    def round_trip(self):
+        """Seconds to hand a trivial call to every worker and collect the answers"""
+        t0 = time.perf_counter()
+        for future in [self.executor.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+        return time.perf_counter() - t0
+
+    def search(self, state, simulations=None, seconds=None):
+        """
+        Searches for simulations per worker or for seconds, at least one of them must be
+        given. Returns the summed root visits by action.
+        """
+        t0 = time.perf_counter()
+        deadline = None if seconds is None else t0 + seconds - self.margin
+        futures = [self.executor.submit(_root_search, self.world, tuple(state), simulations, deadline,
+                                        self.rng.getrandbits(32), self.leaf_rollouts, self.leaf_batch)
+                   for _ in range(self.workers)]
+        visits = np.zeros(len(DIRECTIONS), dtype=np.int64)
+        self.simulations = 0
+        for future in futures:
+            root_visits, done = future.result()
+            visits += root_visits
+            self.simulations += done
+        end = time.perf_counter()
+        self.elapsed = end - t0
+        if deadline is not None:
+            self.margin = max(self.margin, end - deadline)
+        return visits
+
+    def rate_per_core(self):
+        """Simulations per second and worker of the last search"""
+        return self.simulations / (self.elapsed * self.workers)
+
+    def close(self):
+        self.executor.shutdown()
+
 class PlannerAgent:
 	
     def __init__(self):
-        pass
+        self.rng = random
+        self.np_rng = np.random
+        self.simulations = 100
+        self.tree = None
+        self.reuse = True     # keep the tree of the last move when it holds the new state
+        self.transpositions = True   # search the graph of states instead of a tree
+        self.graph = None
+        self.time_budget = None   # seconds per move, replaces the fixed number of simulations
+        self.workers = 1          # more than one searches root parallel trees in a process pool
+        self.leaf_rollouts = 1
+        self.leaf_batch = 1       # leaves of the tree (not the graph) evaluated together
+        self.pool = None
+
+    def set_rng(self, rng, np_rng):
+        """Uses the given python and numpy generators instead of the global ones"""
+        self.rng = rng
+        self.np_rng = np_rng
 
-    def plan_action(self, world: np.ndarray, current: Tuple[int, int], pursued: Tuple[int, int], pursuer: Tuple[int, int]) -> Optional[np.ndarray]:
+    def close(self):
+        """Shuts down the worker processes of the root parallel search, a later move starts new ones"""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    def plan_action(self, world: np.ndarray, current: Tuple[int, int], pursued: Tuple[int, int], pursuer: Tuple[int, int], deadline=None) -> Optional[np.ndarray]:
         """
         Computes a path from the start position to the end position 
         using a certain planning algorithm (DFS is provided as an example).
@@ -150,18 +733,39 @@ class PlannerAgent:
         - 1 represents an obstacle.
         - start (Tuple[int, int]): The (row, column) coordinates of the starting position.
         - end (Tuple[int, int]): The (row, column) coordinates of the goal position.
+        - deadline (float): optional time.perf_counter() time to answer by, the search then
+          runs until the deadline instead of for a fixed number of simulations.
 
         Returns:
         - np.ndarray: A 2D numpy array where each row is a (row, column) coordinate of the path.
         The path starts at 'start' and ends at 'end'. If no path is found, returns None.
         """
 
-        str_action = mcts_search(world, [tuple(current), tuple(pursued), tuple(pursuer)], (0, current), simulations=100)
-        action = str_action.replace("[", "").replace("]", "").split(" ")
-        final_action = []
-        for a in action:
-            final_action.append(int(a))
-        action = np.array(final_action)
-        return action
+        cols = world.shape[1]
+        state = tuple(int(pos[0]) * cols + int(pos[1]) for pos in (current, pursued, pursuer))
+        if deadline is None and self.time_budget is not None:
+            deadline = time.perf_counter() + self.time_budget
+        simulations = self.simulations if deadline is None else None
+
+        if self.workers > 1:
+            if self.pool is None or self.pool.world is not world:
+                if self.pool is not None:
+                    self.pool.close()
+                self.pool = ParallelMCTS(world, self.workers, self.leaf_rollouts, self.rng, self.leaf_batch)
+            visits = self.pool.search(state, simulations, None if deadline is None else max(deadline - time.perf_counter(), 0))
+            return DIRECTIONS[int(np.argmax(visits))]
 
+        if self.transpositions:
+            if self.graph is None or self.graph.world is not world:
+                self.graph = TranspositionMCTS(world, rng=self.rng)
+            self.graph.search(state, simulations, deadline=deadline)
+            return DIRECTIONS[self.graph.best_action(state)]
 
+        if self.tree is None or self.tree.world is not world:
+            self.tree = MCTSTree(world, rng=self.rng, leaf_rollouts=self.leaf_rollouts,
+                                 leaf_batch=self.leaf_batch, np_rng=self.np_rng)
+        tree = self.tree
+        if not (self.reuse and tree.reroot(state)):
+            tree.reset(state)
+        tree.search(simulations, deadline)
+        return DIRECTIONS[tree.best_action()]
@@ -1,96 +1,316 @@
 import random
-from collections import defaultdict
+import time
 import numpy as np
 from typing import List, Tuple, Optional
 
+from planners.policies import load_q_table
+
+DIRECTIONS = np.array([[0,0], [-1, 0], [1, 0], [0, -1], [0, 1],
+                       [-1, -1], [-1, 1], [1, -1], [1, 1]])
+
+class QTable:
+    """
+    Q-values of the 9 actions, one row per visited (state, player) key.
+
+    Keys are plain ints held in an open addressing hash table over numpy
+    arrays: keys[i] is the key stored in slot i (EMPTY if none) and values[i]
+    its Q-values. Lookups and inserts take whole arrays of keys, so a batch
+    of states costs a few array operations instead of one dict access each.
+    """
+
+    EMPTY = -1
+    MAX_LOAD = 0.5
+    HASH = 0x9E3779B97F4A7C15
+
+    def __init__(self, capacity=1 << 12):
+        self.keys = np.full(capacity, self.EMPTY, dtype=np.int64)
+        self.values = np.zeros((capacity, len(DIRECTIONS)))
+        self.size = 0
+        # the most seconds per slot a grow took, to tell in advance how long the next one takes
+        self.grow_seconds = 1e-7
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.values.nbytes
+
+    def _slots(self, keys):
+        # Fibonacci hashing, the top bits of key * 2^64 / golden ratio
+        bits = len(self.keys).bit_length() - 1
+        return ((keys.astype(np.uint64) * np.uint64(self.HASH)) >> np.uint64(64 - bits)).astype(np.int64)
+
+    def _probe(self, keys, insert):
+        """
+        Linear probing for all keys at once, returns their slots (-1 for missing
+        keys when not inserting). Keys must be distinct when inserting.
+        """
+        mask = len(self.keys) - 1
+        slots = self._slots(keys)
+        result = np.full(len(keys), -1, dtype=np.int64)
+        pending = np.arange(len(keys))
+        while pending.size:
+            s = slots[pending]
+            stored = self.keys[s]
+            hit = stored == keys[pending]
+            result[pending[hit]] = s[hit]
+            empty = stored == self.EMPTY
+            if insert:
+                # claim empty slots, when several keys claim the same slot one of them
+                # finds itself there in the next round and the others probe on
+                self.keys[s[empty]] = keys[pending[empty]]
+                self.size += np.count_nonzero(self.keys[s[empty]] == keys[pending[empty]])
+                retry = empty
+            else:
+                retry = np.zeros_like(empty)
+            occupied = ~hit & ~empty
+            slots[pending[occupied]] = (s[occupied] + 1) & mask
+            pending = pending[occupied | retry]
+        return result
+
+    def _capacity(self, extra):
+        capacity = len(self.keys)
+        while self.size + extra > capacity * self.MAX_LOAD:
+            capacity *= 2
+        return capacity
+
+    def _grow(self, extra):
+        capacity = self._capacity(extra)
+        if capacity == len(self.keys):
+            return
+        t0 = time.perf_counter()
+        used = self.keys != self.EMPTY
+        keys, values = self.keys[used], self.values[used]
+        self.keys = np.full(capacity, self.EMPTY, dtype=np.int64)
+        self.values = np.zeros((capacity, len(DIRECTIONS)))
+        self.size = 0
+        self.values[self._probe(keys, insert=True)] = values
+        self.grow_seconds = max(self.grow_seconds, (time.perf_counter() - t0) / capacity)
+
+    def grow_time(self, extra):
+        """Estimated seconds it takes to make room for extra more keys, 0 if they fit"""
+        capacity = self._capacity(extra)
+        # larger tables take longer per slot, leave a margin
+        return 0 if capacity == len(self.keys) else 2 * capacity * self.grow_seconds
+
+    def reserve(self, extra):
+        """Makes room for extra more keys, so that adding them does not grow the table"""
+        self._grow(extra)
+
+    def lookup_many(self, keys):
+        """The rows of an array of keys, -1 marks keys that were never updated"""
+        return self._probe(np.asarray(keys, dtype=np.int64), insert=False)
+
+    def row_many(self, keys):
+        """The rows of an array of keys, missing keys are added with zero Q-values"""
+        keys, inverse = np.unique(np.asarray(keys, dtype=np.int64), return_inverse=True)
+        self._grow(len(keys))
+        return self._probe(keys, insert=True)[inverse]
+
+    def get_many(self, keys):
+        """The Q-values of an array of keys, zeros for keys that were never updated"""
+        rows = self.lookup_many(keys)
+        return np.where(rows[:, None] >= 0, self.values[rows], 0)
+
+    def _find(self, key):
+        """The slot holding key, or the empty slot where it would go"""
+        # the same probing as _probe in plain python, cheaper than array operations for a single key
+        mask = len(self.keys) - 1
+        slot = ((key * self.HASH) & 0xFFFFFFFFFFFFFFFF) >> (65 - len(self.keys).bit_length())
+        while True:
+            stored = self.keys[slot]
+            if stored == key or stored == self.EMPTY:
+                return slot
+            slot = (slot + 1) & mask
+
+    def lookup(self, key):
+        """The row of key, None if the key was never updated"""
+        slot = self._find(key)
+        return slot if self.keys[slot] == key else None
+
+    def row(self, key):
+        """The row of key, added with zero Q-values on first use"""
+        slot = self._find(key)
+        if self.keys[slot] != key:
+            if self.size + 1 > len(self.keys) * self.MAX_LOAD:
+                self._grow(1)
+                slot = self._find(key)
+            self.keys[slot] = key
+            self.size += 1
+        return slot
+
+    def entries(self):
+        """The keys and Q-values of all stored states"""
+        used = self.keys != self.EMPTY
+        return self.keys[used], self.values[used]
+
+    def thaw(self):
+        return self
+
+class FrozenQTable:
+    """
+    A read-only QTable over the sorted (keys, values) arrays of a stored policy,
+    typically memory-mapped. Lookups are binary searches, thaw() turns it back
+    into a QTable that can be trained further.
+    """
+
+    def __init__(self, keys, values):
+        # the keys are searched on every lookup, keep a contiguous copy of them
+        self.keys = np.ascontiguousarray(keys)
+        self.values = values
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.values.nbytes
+
+    def lookup_many(self, keys):
+        keys = np.asarray(keys, dtype=np.int64)
+        if not len(self.keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        rows = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return np.where(self.keys[rows] == keys, rows, -1)
+
+    def get_many(self, keys):
+        rows = self.lookup_many(keys)
+        return np.where(rows[:, None] >= 0, self.values[rows], 0)
+
+    def lookup(self, key):
+        r = int(np.searchsorted(self.keys, key))
+        return r if r < len(self.keys) and self.keys[r] == key else None
+
+    def entries(self):
+        return self.keys, self.values
+
+    def thaw(self):
+        table = QTable()
+        rows = table.row_many(self.keys)
+        table.values[rows] = self.values
+        return table
+
 class PlannerAgent:
     def __init__(self):
         self.first_run = True
-        self.Q = defaultdict(float)
+        self.Q = QTable()
         self.alpha = 0.5     # learning rate
         self.gamma = 0.9     # discount factor
         self.epsilon = 0.1   # exploration rate
-	
-    def get_legal_actions(self, world, player):
+        self.updates = 0     # number of Q-value updates so far
+        self.episodes = 1024 # training episodes, played batch_size at a time
+        self.batch_size = 1024
+        self.trained = 0     # training episodes played so far
+        self.round_seconds = 0.0   # the longest a round of play_batch took, to budget batches by
+        self.rng = random
+        self.np_rng = np.random
+        self.world = None
+        # optional directory of the tables stored by pretrain.py, games only read them so
+        # that they do not depend on each other or overwrite the pretrained tables
+        self.policy_dir = None
+        # whether a stored table is trained further from the actual start state during the
+        # game, in memory only. Off by default, the stored table is then played as it is.
+        self.online_training = False
+
+    def set_rng(self, rng, np_rng):
+        """Uses the given python and numpy generators instead of the global ones"""
+        self.rng = rng
+        self.np_rng = np_rng
+
+    def set_world(self, world):
+        """
+        Precomputes the legal actions of every cell of the world.
+        Positions are handled as cell indices row * cols + column from here on.
+        """
+        if self.world is world:
+            return
+        self.world = world
+        if self.policy_dir is not None:
+            stored = load_q_table(world, self.policy_dir)
+            if stored is not None:
+                if self.online_training:
+                    self.Q = FrozenQTable(*stored).thaw()
+                else:
+                    self.Q = FrozenQTable(*stored)
+                    self.first_run = False
+        rows, cols = world.shape
+        self.cols = cols
+        self.cells = rows * cols
+        # moving by action a adds offsets[a] to the cell index
+        self.offsets = [int(dx * cols + dy) for dx, dy in DIRECTIONS]
+        # legal_mask[cell, a] is True if action a from cell stays inside the world and off obstacles
+        padded = np.pad(world == 0, 1, constant_values=False)
+        self.legal_mask = np.stack([padded[1+dx:rows+1+dx, 1+dy:cols+1+dy].ravel() for dx, dy in DIRECTIONS], axis=1)
+        self.legal = [np.flatnonzero(mask).tolist() for mask in self.legal_mask]
+
+    def cell(self, pos):
+        return int(pos[0]) * self.cols + int(pos[1])
+
+    def get_legal_actions(self, state, player):
         """
         A function to get all legal actions regarding a player
-        Returns an array of (x, y) that are valid moves
-        """
-        directions = np.array([[0,0], [-1, 0], [1, 0], [0, -1], [0, 1],
-                               [-1, -1], [-1, 1], [1, -1], [1, 1]])
-        current = player[1]
-        rows = len(world)
-        cols = len(world[0])
-        legal = []
-        for dirc in directions:
-            nx = current[0] + dirc[0]
-            ny = current[1] + dirc[1]
-            if 0 <= nx < rows and 0 <= ny < cols and world[nx][ny] == 0:
-                legal.append(dirc)
-        return legal
+        Returns the indices into DIRECTIONS of the valid moves
+        """
+        return self.legal[state[player]]
 
     def apply_action(self, state, action, player):
         """
         A function to move the player with the given action
         Returns the updated state
         """
-        state[player[0]] = (player[1][0] + action[0], player[1][1] + action[1]) 
-        return state
+        state = list(state)
+        state[player] += self.offsets[action]
+        return tuple(state)
 
     def check_winner(self, state, player):
         """
         Checks if there has been a winner
         Returns the score regarding the player for the winner
         """
-        current = state[player[0]]
-        pursued = state[(player[0]-1)%3]
-        pursuer = state[(player[0]+1)%3]
+        current = state[player]
+        pursued = state[(player+1)%3]
+        pursuer = state[(player-1)%3]
         if current == pursued:
             return 3
         if current == pursuer:
             return -3
         if pursued == pursuer:
             return 1
-        
-    # --- Q-learning agent ---
 
-    def stringify(self, state):
-        """
-        A function that converts the state of players positions into a string
-        Returns the converted string
-        """
-        upper = []
-        for s in state:
-            sstring = str(s)
-            upper.append(sstring)
-        return " ".join(upper)
+    # --- Q-learning agent ---
 
-    def unstringify(self, upper):
+    def encode(self, state, player):
         """
-        A function that converts the string of the state into an array of positions
-        Returns the array
+        A function that converts the positions of the players and the player to move into one int
+        Returns the Q-table key
         """
-        state = []
-        u = upper.split(" ")
-        for s in u:
-            pos = s.split(", ")
-            state.append(pos)
-        return state
-
+        return ((state[0] * self.cells + state[1]) * self.cells + state[2]) * 3 + player
 
-    def choose_action(self, world, state, player):
+    def choose_action(self, state, player):
         """
         A function to choose an action given a specific state
         """
+        legal = self.get_legal_actions(state, player)
+        if not legal:
+            return 0
         #keep a chance to take a random action
-        if random.random() < self.epsilon:
-            return random.choice(self.get_legal_actions(world, player))
-        #must use string of state in order to store as dictionary key
-        state_string = self.stringify(state)
-        qs = [self.Q[(state_string, str(a), str(player))] for a in self.get_legal_actions(world, player)]
-        max_q = max(qs)
-        best_actions = [a for a in self.get_legal_actions(world, player) if self.Q[(state_string, str(a), str(player))] == max_q]
-        return random.choice(best_actions)
+        if self.rng.random() < self.epsilon:
+            return self.rng.choice(legal)
+        r = self.Q.lookup(self.encode(state, player))
+        if r is None:
+            return self.rng.choice(legal)
+        qs = self.Q.values[r, legal]
+        max_q = qs.max()
+        best_actions = [a for a, q in zip(legal, qs) if q == max_q]
+        return self.rng.choice(best_actions)
+
+    def max_q(self, state, player):
+        r = self.Q.lookup(self.encode(state, player))
+        legal = self.get_legal_actions(state, player)
+        if r is None or not legal:
+            return 0
+        return max(self.Q.values[r, legal].max(), 0)
 
     # --- Play one game up to 100 actions and update Q ---
     def play_game(self, state, rounds=100):
@@ -98,51 +318,153 @@ class PlannerAgent:
         A function to play a game up to rounds number of rounds or until
         someone wins
         """
-        #assure state is a list
-        state = list(state)
-
-        #get the map, and all the positions of players
-        world = state[0]
-        state = state[1:]
-
-        for i in range(len(state)):
-            state[i] = tuple(state[i])
+        self.Q = self.Q.thaw()
         #start with "current"
-        player = (0, state[0])
+        player = 0
         history = []
         round_num = 0
 
         while True:
 
-            action = self.choose_action(world, state, player)
+            action = self.choose_action(state, player)
             next_state = self.apply_action(state, action, player)
             winner = self.check_winner(next_state, player)
 
-            history.append((self.stringify(state), str(action), player, self.stringify(next_state)))
+            history.append((state, action, player, next_state))
 
             if winner or round_num > rounds:
-                # Assign rewards
+                # Assign rewards, each move is rewarded from the point of view of the player making it
                 for s, a, p, s_next in reversed(history):
                     if round_num > rounds:
                         reward = 1
                     else:
-                        reward = winner
-                    max_q = max([self.Q[(s_next, str(a2), p)] for a2 in self.get_legal_actions(world, p)] + [0])
-                    self.Q[(s, a, p)] += self.alpha * (reward + self.gamma * max_q - self.Q[(s, a, p)])
+                        reward = self.check_winner(next_state, p)
+                    max_q = self.max_q(s_next, p)
+                    r = self.Q.row(self.encode(s, p))
+                    self.Q.values[r, a] += self.alpha * (reward + self.gamma * max_q - self.Q.values[r, a])
+                self.updates += len(history)
                 break
 
             state = next_state
-            player_num = (player[0]+1)%3
-            player = (player_num, state[player_num])
+            player = (player+1)%3
             round_num += 1
 
+    # --- Play a batch of games in lockstep with array operations ---
+    def max_q_many(self, states, player):
+        qs = self.Q.get_many(self.encode(states.T, player))
+        qs = np.where(self.legal_mask[states[:, player]], qs, -np.inf)
+        return np.maximum(qs.max(axis=1), 0)
+
+    def play_batch(self, state, n, rounds=100, deadline=None):
+        """
+        Plays n games from state at once, like play_game but with every step
+        applied to the whole batch, and updates Q from all of them.
+        With a time.perf_counter() deadline, the games are played for a quarter of the time
+        left, since the backward update pass takes two to three times as long as the play.
+        Games still running then end as if they reached rounds, and an update pass cut by
+        the deadline is undone, so that Q only ever holds whole passes.
+        Returns the number of games that were played and updated to the end.
+        """
+        self.Q = self.Q.thaw()
+        play_deadline = None if deadline is None else time.perf_counter() + (deadline - time.perf_counter()) / 4
+        states = np.tile(np.array(state, dtype=np.int64), (n, 1))
+        offsets = np.array(self.offsets, dtype=np.int64)
+        active = np.ones(n, dtype=bool)
+        reward = np.ones((n, 3))
+        history = []
+        player = 0
+        round_num = 0
+        finished = n
+
+        while active.any():
+            t0 = time.perf_counter()
+            idx = np.flatnonzero(active)
+            current = states[idx]
+            legal = self.legal_mask[current[:, player]]
+
+            # epsilon-greedy with random tie breaking: the highest score among the best (or all legal) actions
+            qs = np.where(legal, self.Q.get_many(self.encode(current.T, player)), -np.inf)
+            best = qs == qs.max(axis=1, keepdims=True)
+            explore = self.np_rng.random(len(idx)) < self.epsilon
+            candidates = np.where(explore[:, None], legal, best & legal)
+            scores = np.where(candidates, self.np_rng.random(candidates.shape), -1)
+            action = np.where(legal.any(axis=1), scores.argmax(axis=1), 0)
+
+            next_states = current.copy()
+            next_states[:, player] += offsets[action]
+            states[idx] = next_states
+            history.append((idx, current, action, player, next_states))
+
+            # a game ends once any agent stands on the agent it pursues
+            caught = ((next_states[:, 0] == next_states[:, 1]) | (next_states[:, 1] == next_states[:, 2]) |
+                      (next_states[:, 2] == next_states[:, 0]))
+            if caught.any():
+                ended = next_states[caught]
+                for p in range(3):
+                    # check_winner of every ended game, 1 when the other two met
+                    current, pursued, pursuer = ended[:, p], ended[:, (p+1)%3], ended[:, (p-1)%3]
+                    reward[idx[caught], p] = np.where(current == pursued, 3, np.where(current == pursuer, -3, 1))
+            if round_num > rounds:
+                caught[:] = True
+            elif play_deadline is not None and time.perf_counter() > play_deadline:
+                finished -= np.count_nonzero(~caught)
+                caught[:] = True
+            active[idx[caught]] = False
+
+            player = (player+1)%3
+            round_num += 1
+            self.round_seconds = max(self.round_seconds, time.perf_counter() - t0)
+
+        if deadline is not None:
+            # growing a large table takes long, do it up front and only if it ends by the deadline
+            keys = np.unique(np.concatenate([self.encode(s.T, p) for _, s, _, p, _ in history]))
+            # row_many makes room for all keys of a step as if they were new
+            new = np.count_nonzero(self.Q.lookup_many(keys) < 0) + max(len(h[0]) for h in history)
+            if time.perf_counter() + self.Q.grow_time(new) > deadline:
+                return 0
+            self.Q.reserve(new)
+
+        # Assign rewards backwards, games updating the same entry in the same step share one averaged update
+        undo = []
+        for idx, s, a, p, s_next in reversed(history):
+            if deadline is not None and time.perf_counter() > deadline:
+                # restore the values the pass changed, the entries it added keep their zeros,
+                # which play like missing ones
+                for rows, a, old in reversed(undo):
+                    self.Q.values[rows, a] = old
+                return 0
+            max_q = self.max_q_many(s_next, p)
+            rows = self.Q.row_many(self.encode(s.T, p))
+            old = self.Q.values[rows, a]
+            if deadline is not None:
+                undo.append((rows, a, old))
+            delta = self.alpha * (reward[idx, p] + self.gamma * max_q - old)
+            _, inverse, counts = np.unique(rows * len(DIRECTIONS) + a, return_inverse=True, return_counts=True)
+            np.add.at(self.Q.values, (rows, a), delta / counts[inverse])
+        self.updates += sum(len(h[0]) for h in history)
+        return finished
+
     # --- Training loop ---
-    def train(self, state):
-        for _ in range(100):
-            self.play_game(state)
+    def train(self, state, deadline=None):
+        """
+        Plays the remaining training episodes in batches. With a time.perf_counter()
+        deadline the batches are cut short to end by the deadline, and only the
+        episodes that were played to the end count as trained.
+        Returns True once all episodes have been played.
+        """
+        while self.trained < self.episodes:
+            n = min(self.batch_size, self.episodes - self.trained)
+            if deadline is None:
+                self.trained += self.play_batch(state, n)
+            else:
+                # the games are played for a quarter of the time left, which has to fit a round
+                if deadline - time.perf_counter() < 4 * self.round_seconds:
+                    return False
+                self.trained += self.play_batch(state, n, deadline=deadline)
+        return True
 
 
-    def plan_action(self, world: np.ndarray, current: np.ndarray, pursued: np.ndarray, pursuer: np.ndarray) -> Optional[np.ndarray]:
+    def plan_action(self, world: np.ndarray, current: np.ndarray, pursued: np.ndarray, pursuer: np.ndarray, deadline=None) -> Optional[np.ndarray]:
         """
         Computes a action to take from the current position caputure the pursued while evading from the pursuer
 
@@ -153,15 +475,18 @@ class PlannerAgent:
         - current (np.ndarray): The (row, column) coordinates of the current position.
         - pursued (np.ndarray): The (row, column) coordinates of the agent to be pursued.
         - pursuer (np.ndarray): The (row, column) coordinates of the agent to evade from.
+        - deadline (float): optional time.perf_counter() time to answer by, the training
+          is then spread over as many moves as it needs.
 
         Returns:
-        - np.ndarray: one of the 9 actions from 
+        - np.ndarray: one of the 9 actions from
                             [0,0], [-1, 0], [1, 0], [0, -1], [0, 1],
                             [-1, -1], [-1, 1], [1, -1], [1, 1]
         """
+        self.set_world(world)
+        state = (self.cell(current), self.cell(pursued), self.cell(pursuer))
         if self.first_run:
-            self.train((world, current, pursued, pursuer))
-        self.first_run = False
+            self.first_run = not self.train(state, deadline)
 
-        action = self.choose_action(world, [current, pursued, pursuer], (0, current))
-        return action
+        action = self.choose_action(state, 0)
+        return DIRECTIONS[action]
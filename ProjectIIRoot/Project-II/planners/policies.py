@@ -0,0 +1,60 @@
+import json
+import os
+import numpy as np
+
+from planners.distances import KEY_LENGTH, world_key
+
+# Learned Q-tables are stored per grid as data/policies/qtable_<key>.npy, with optional
+# metadata of how they were trained in qtable_<key>.json next to them
+POLICY_DIR = "data/policies"
+
+def q_table_path(world, directory=POLICY_DIR):
+    return os.path.join(directory, "qtable_" + world_key(world)[:KEY_LENGTH] + ".npy")
+
+def q_table_meta_path(world, directory=POLICY_DIR):
+    return os.path.join(directory, "qtable_" + world_key(world)[:KEY_LENGTH] + ".json")
+
+def save_q_table(world, table, directory=POLICY_DIR, meta=None):
+    """
+    Writes the entries of a QTable as one structured array sorted by key, with
+    float16 Q-values and without the empty hash slots. The file is written
+    through a temporary name so that concurrent readers never map a partial table.
+    The dict meta is written after the table, if given.
+    """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    keys, values = table.entries()
+    order = np.argsort(keys)
+    data = np.empty(len(keys), dtype=[("key", np.int64), ("q", np.float16, values.shape[1])])
+    data["key"] = keys[order]
+    data["q"] = values[order]
+    path = q_table_path(world, directory)
+    tmp = path + "." + str(os.getpid()) + ".tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, data)
+    os.replace(tmp, path)
+    if meta is not None:
+        path = q_table_meta_path(world, directory)
+        tmp = path + "." + str(os.getpid()) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, path)
+
+def load_q_table_meta(world, directory=POLICY_DIR):
+    """The metadata stored with the table of world, None if there is none"""
+    path = q_table_meta_path(world, directory)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def load_q_table(world, directory=POLICY_DIR):
+    """
+    Memory-maps the stored table of world read-only.
+    Returns the sorted (keys, values) arrays, or None if the grid has no stored table.
+    """
+    path = q_table_path(world, directory)
+    if not os.path.exists(path):
+        return None
+    data = np.load(path, mmap_mode="r")
+    return data["key"], data["q"]
@@ -5,7 +5,13 @@ from typing import List, Tuple, Optional
 class PlannerAgent:
     
     def __init__(self):
-        pass
+        self.rng = random
+        self.np_rng = np.random
+
+    def set_rng(self, rng, np_rng):
+        """Uses the given python and numpy generators instead of the global ones"""
+        self.rng = rng
+        self.np_rng = np_rng
     
     def plan_action(self, world: np.ndarray, current: np.ndarray, pursued: np.ndarray, pursuer: np.ndarray) -> Optional[np.ndarray]:
         """
@@ -28,6 +34,6 @@ class PlannerAgent:
         directions = np.array([[0,0], [-1, 0], [1, 0], [0, -1], [0, 1],
                                    [-1, -1], [-1, 1], [1, -1], [1, 1]])
           
-        return random.choice(directions)
+        return self.rng.choice(directions)
 
 
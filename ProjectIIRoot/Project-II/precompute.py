@@ -0,0 +1,16 @@
+import argparse
+import time
+import numpy as np
+
+from planners.distances import save_table
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the all-pairs distance and next-hop tables of the grids")
+    parser.add_argument("--ids", type=int, nargs="+", default=list(range(100)))
+    args = parser.parse_args()
+
+    for id in args.ids:
+        t0 = time.perf_counter()
+        world = np.load("data/grid_files/grid_"+str(id)+".npy")
+        built = save_table(id, world)
+        print ("Grid %d: %s (%.2fs)" % (id, "built" if built else "up to date", time.perf_counter() - t0))
@@ -0,0 +1,72 @@
+import argparse
+import os
+import random
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from main import select_valid_locations, start_positions
+from planners.policies import POLICY_DIR, load_q_table, load_q_table_meta, save_q_table
+from planners.tom import FrozenQTable, PlannerAgent as QLearningAgent
+
+def pretrain_grid(id, episodes, batch_size, checkpoint_every, seed, policy_dir, tournament_seed=0, runs=5):
+    """
+    Trains the Q-learning agent on one grid and stores its table, every
+    checkpoint_every batches and at the end. The first runs batches start from
+    the positions of the tournament's games with tournament_seed, so that the
+    table covers the states the agent is asked about first, the later ones from
+    random positions. Without a tournament_seed all of them start at random.
+    A table stored by an earlier run is loaded first and trained further. If it
+    was stored with the same seeds, runs and batch size, the batches it has already
+    played are skipped, so an interrupted run resumes where its last checkpoint left off.
+    Returns the grid id, the number of states, the batches played and the seconds taken.
+    """
+    world = np.load("data/grid_files/grid_"+str(id)+".npy")
+    agent = QLearningAgent()
+    agent.set_world(world)
+    stored = load_q_table(world, policy_dir)
+    if stored is not None:
+        agent.Q = FrozenQTable(*stored).thaw()
+    setup = {"seed": seed, "batch_size": batch_size, "tournament_seed": tournament_seed, "runs": runs}
+    meta = load_q_table_meta(world, policy_dir) or {}
+    done = meta.get("batches", 0) if all(meta.get(k) == v for k, v in setup.items()) else 0
+
+    t0 = time.perf_counter()
+    batches = (episodes + batch_size - 1) // batch_size
+    for b in range(done, batches):
+        # every batch has its own random streams, so that skipped batches do not shift the later ones
+        seeds = np.random.SeedSequence([seed, id, b])
+        rng = random.Random(int(seeds.generate_state(1)[0]))
+        agent.set_rng(rng, np.random.default_rng(seeds))
+        if tournament_seed is not None and b < runs:
+            positions = start_positions(world, id, b, tournament_seed)
+        else:
+            # the tournament places the agents at random, so train from a fresh start every batch
+            positions = select_valid_locations(world, num_points=3, min_distance=3, rng=rng)
+        state = tuple(agent.cell(p) for p in positions)
+        agent.play_batch(state, min(batch_size, episodes - b * batch_size))
+        if (b + 1) % checkpoint_every == 0 or b == batches - 1:
+            save_q_table(world, agent.Q, policy_dir, dict(setup, batches=b + 1))
+    return id, len(agent.Q), max(batches - done, 0), time.perf_counter() - t0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the Q-learning agent offline on every grid")
+    parser.add_argument("--ids", type=int, nargs="+", default=list(range(100)))
+    parser.add_argument("--episodes", type=int, default=8192, help="training episodes per grid")
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--checkpoint-every", type=int, default=4, help="batches between checkpoints")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--policy-dir", default=POLICY_DIR)
+    parser.add_argument("--tournament-seed", type=int, default=0,
+                        help="seed of the tournament whose start positions the first batches are trained from")
+    parser.add_argument("--runs", type=int, default=5, help="games per grid of that tournament")
+    args = parser.parse_args()
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(pretrain_grid, id, args.episodes, args.batch_size,
+                                   args.checkpoint_every, args.seed, args.policy_dir,
+                                   args.tournament_seed, args.runs) for id in args.ids]
+        for future in futures:
+            id, states, played, elapsed = future.result()
+            print ("Grid %d: %d states, %d batches played (%.1fs)" % (id, states, played, elapsed))
@@ -0,0 +1,100 @@
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from main import Task
+from gamelog import GameLogBuffer, GameLogStore
+
+AGENTS = ["Tom", "Jerry", "Spike"]
+
+def run_task(id, running_id, seed, task_kwargs, buffer_log=False):
+    """
+    Plays one game in a worker process, returns (id, running_id, points, latency, logs)
+    with the Task.latency_stats of the game. With buffer_log the state log is returned
+    in logs instead of written to a csv file.
+    """
+    buffer = GameLogBuffer() if buffer_log else None
+    T = Task(id, running_id, seed=seed, log_store=buffer, **task_kwargs)
+    points = T.run()
+    return id, running_id, points, T.latency_stats(), buffer.entries if buffer_log else []
+
+def run_tournament(ids, runs=5, workers=None, base_seed=0, task_kwargs=None, log_store=None):
+    """
+    Plays every grid in ids `runs` times, spread over a pool of worker processes.
+    If log_store is given, the workers send their state logs back and they are
+    appended to it in game order, otherwise every game writes its own csv file.
+
+    Returns an int array with one row (id, running_id, Tom, Jerry, Spike) per game,
+    sorted by id and running_id, and the games' decision latencies as a float array
+    of shape (games, 3, 3): p50, p95 and max in seconds for each agent.
+    """
+    task_kwargs = task_kwargs or {}
+    games = [(id, running_id) for id in ids for running_id in range(runs)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_task, id, running_id, base_seed, task_kwargs, log_store is not None)
+                   for id, running_id in games]
+        results = []
+        latency = []
+        for future in futures:
+            id, running_id, points, stats, logs = future.result()
+            results.append(np.hstack([id, running_id, points]))
+            latency.append(stats)
+            if log_store is not None:
+                log_store.extend(logs)
+    return np.array(results, dtype=int), np.array(latency)
+
+def summarize(results, latency=None):
+    """
+    Aggregates the per-game points into total/mean points and win/tie/collision counts per agent.
+    With the latency of run_tournament, adds the mean per-game p50 and p95 and the overall max decision time.
+    """
+    points = results[:, 2:]
+    won = np.any(points == 3, axis=1)
+    tie = np.all(points == 1, axis=1)
+    summary = pd.DataFrame({
+        "agent": AGENTS,
+        "total": points.sum(axis=0),
+        "mean": points.mean(axis=0),
+        "wins": (points == 3).sum(axis=0),
+        "ties": np.full(3, tie.sum()),
+        "collisions": ((points == 0) & ~won[:, None]).sum(axis=0),
+    })
+    if latency is not None:
+        summary["p50_ms"] = latency[:, 0].mean(axis=0) * 1000
+        summary["p95_ms"] = latency[:, 1].mean(axis=0) * 1000
+        summary["max_ms"] = latency[:, 2].max(axis=0) * 1000
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the 100 grid x 5 run tournament over a process pool")
+    parser.add_argument("--ids", type=int, nargs="+", default=list(range(100)))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--time-budget", type=float, nargs="+",
+                        help="seconds per decision, one value for all agents or one per agent")
+    parser.add_argument("--out", help="optional csv file for the per-game points and decision latencies")
+    parser.add_argument("--policy-dir", help="read the policies stored by pretrain.py from here, the games never write to it")
+    parser.add_argument("--online-training", action="store_true",
+                        help="keep training the stored policies during each game instead of playing them as they are")
+    parser.add_argument("--log-store", help="append all state logs to this binary store (see gamelog.py) instead of csv files")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    budget = args.time_budget[0] if args.time_budget and len(args.time_budget) == 1 else args.time_budget
+    task_kwargs = {"time_budget": budget, "policy_dir": args.policy_dir, "online_training": args.online_training}
+    results, latency = run_tournament(args.ids, args.runs, args.workers, args.seed, task_kwargs,
+                                      log_store=GameLogStore(args.log_store) if args.log_store else None)
+    elapsed = time.perf_counter() - t0
+
+    if args.out:
+        games = pd.DataFrame(results, columns=["id", "running_id"] + AGENTS)
+        for i, stat in enumerate(["p50", "p95", "max"]):
+            for j, agent in enumerate(AGENTS):
+                games[agent + "_" + stat + "_ms"] = latency[:, i, j] * 1000
+        games.to_csv(args.out, index=False)
+    print(summarize(results, latency).to_string(index=False, float_format="%.3f"))
+    print ("%d games in %.1fs with %d workers" % (len(results), elapsed, args.workers))
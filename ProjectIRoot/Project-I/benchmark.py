@@ -0,0 +1,54 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+from planner import plan_path, octile
+
+def load_tasks(num_tasks=100):
+    """Loads the grids of the first num_tasks tasks with their start and end positions"""
+    tasks = pd.read_csv("data/grid_tasks.csv")
+    worlds = [np.load("data/grid_files/grid_"+str(id)+".npy") for id in range(num_tasks)]
+    starts = tasks[["StartX", "StartY"]].to_numpy()[:num_tasks]
+    ends = tasks[["EndX", "EndY"]].to_numpy()[:num_tasks]
+    return worlds, starts, ends
+
+def path_length(path):
+    """Length of a path with diagonal moves counted as sqrt(2)"""
+    return sum(octile(a, b) for a, b in zip(path[:-1], path[1:]))
+
+def run(method, heuristic, worlds, starts, ends, repeat=1):
+    """Plans every task `repeat` times and returns the aggregated statistics"""
+    expanded, moves, length, failed = 0, 0, 0.0, 0
+    elapsed = 0.0
+    for world, start, end in zip(worlds, starts, ends):
+        for _ in range(repeat):
+            stats = {}
+            t0 = time.perf_counter()
+            path = plan_path(world, start, end, method=method, heuristic=heuristic, stats=stats)
+            elapsed += time.perf_counter() - t0
+        expanded += stats.get("expanded", 0)
+        if path is None:
+            failed += 1
+            continue
+        moves += len(path) - 1
+        length += path_length(path)
+    n = len(worlds)
+    return {"method": method, "heuristic": heuristic,
+            "expanded": expanded / n, "moves": moves / n, "length": length / n,
+            "us/query": 1e6 * elapsed / (n * repeat), "failed": failed}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the planners of planner.py on all grid tasks")
+    parser.add_argument("--methods", nargs="+", default=["dfs", "bfs", "dijkstra", "astar", "jps", "field"])
+    parser.add_argument("--heuristics", nargs="+", default=["octile", "chebyshev"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    worlds, starts, ends = load_tasks()
+    rows = []
+    for method in args.methods:
+        # dfs and bfs do not use the cost model, one run is enough
+        for heuristic in (args.heuristics if method in ("dijkstra", "astar") else args.heuristics[:1]):
+            rows.append(run(method, heuristic, worlds, starts, ends, repeat=args.repeat))
+    print(pd.DataFrame(rows).to_string(index=False, float_format="%.1f"))
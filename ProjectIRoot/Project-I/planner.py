@@ -1,8 +1,36 @@
+import heapq
+import math
 import numpy as np
+from collections import deque
 from typing import List, Tuple, Optional
 import scipy
 
-def dfs(grid, start, end):
+SQRT2 = math.sqrt(2)
+
+# Consider all 8 possible moves (up, down, left, right, and diagonals)
+DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1),  # Up, Down, Left, Right
+              (-1, -1), (-1, 1), (1, -1), (1, 1)]  # Diagonal moves
+
+def octile(a, b):
+    """Octile distance, exact for 8-connected moves with diagonal cost sqrt(2)"""
+    dx, dy = abs(a[0] - b[0]), abs(a[1] - b[1])
+    return max(dx, dy) + (SQRT2 - 1) * min(dx, dy)
+
+def chebyshev(a, b):
+    """Chebyshev distance, exact for 8-connected moves with unit diagonal cost"""
+    return max(abs(a[0] - b[0]), abs(a[1] - b[1]))
+
+HEURISTICS = {"octile": octile, "chebyshev": chebyshev}
+
+def reconstruct(parent, node):
+    """Walks the parent links back from node and returns the path from the root"""
+    path = []
+    while node is not None:
+        path.append(node)
+        node = parent[node]
+    return path[::-1]
+
+def dfs(grid, start, end, stats=None):
     """A DFS example"""
     rows, cols = len(grid), len(grid[0])
     stack = [start]
@@ -28,6 +56,8 @@ def dfs(grid, start, end):
         if (x, y) in visited:
             continue
         visited.add((x, y))
+        if stats is not None:
+            stats["expanded"] = stats.get("expanded", 0) + 1
 
         for dx, dy in directions:
             nx, ny = x + dx, y + dy
@@ -37,10 +67,241 @@ def dfs(grid, start, end):
 
     return None  # Return None if no path is found
 
-def plan_path(world: np.ndarray, start: Tuple[int, int], end: Tuple[int, int]) -> Optional[np.ndarray]:
+def bfs(grid, start, end, stats=None):
+    """Breadth-first search, shortest path in number of moves"""
+    rows, cols = len(grid), len(grid[0])
+    queue = deque([start])
+    parent = {start: None}
+    expanded = 0
+
+    while queue:
+        node = queue.popleft()
+        expanded += 1
+        if node == end:
+            break
+        x, y = node
+        for dx, dy in DIRECTIONS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < rows and 0 <= ny < cols and grid[nx][ny] == 0 and (nx, ny) not in parent:
+                parent[(nx, ny)] = node
+                queue.append((nx, ny))
+
+    if stats is not None:
+        stats["expanded"] = stats.get("expanded", 0) + expanded
+    return reconstruct(parent, end) if end in parent else None
+
+def astar(grid, start, end, heuristic=octile, diagonal=SQRT2, stats=None):
+    """
+    A* search over the 8-connected grid with a binary heap as the open list
+
+    Straight moves cost 1 and diagonal moves cost `diagonal`. The heuristic
+    must be admissible for that cost model (octile for sqrt(2), chebyshev
+    for 1); passing heuristic=None turns the search into Dijkstra.
+    """
+    rows, cols = len(grid), len(grid[0])
+    steps = [(dx, dy, 1 if dx == 0 or dy == 0 else diagonal) for dx, dy in DIRECTIONS]
+    h = heuristic if heuristic is not None else (lambda a, b: 0)
+
+    g = {start: 0}
+    parent = {start: None}
+    closed = set()
+    # the counter breaks ties between equal f values without comparing nodes
+    counter = 0
+    open_list = [(h(start, end), counter, start)]
+    expanded = 0
+
+    while open_list:
+        _, _, node = heapq.heappop(open_list)
+        if node in closed:
+            continue
+        closed.add(node)
+        expanded += 1
+        if node == end:
+            break
+        x, y = node
+        for dx, dy, cost in steps:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < rows and 0 <= ny < cols and grid[nx][ny] == 0:
+                nxt = (nx, ny)
+                if nxt in closed:
+                    continue
+                ng = g[node] + cost
+                if ng < g.get(nxt, math.inf):
+                    g[nxt] = ng
+                    parent[nxt] = node
+                    counter += 1
+                    heapq.heappush(open_list, (ng + h(nxt, end), counter, nxt))
+
+    if stats is not None:
+        stats["expanded"] = stats.get("expanded", 0) + expanded
+    return reconstruct(parent, end) if end in closed else None
+
+def dijkstra(grid, start, end, diagonal=SQRT2, stats=None):
+    """Dijkstra's algorithm, i.e. A* without a heuristic"""
+    return astar(grid, start, end, heuristic=None, diagonal=diagonal, stats=stats)
+
+def walkable(grid, x, y):
+    """True if (x, y) is inside the grid and not an obstacle"""
+    return 0 <= x < len(grid) and 0 <= y < len(grid[0]) and grid[x][y] == 0
+
+def has_forced(grid, x, y, dx, dy):
+    """
+    Checks whether the node (x, y), reached by moving in direction (dx, dy),
+    has a forced neighbor. Diagonal moves may cut corners, as the
+    validity check only requires every cell on the path to be free.
+    """
+    if dx != 0 and dy != 0:
+        return ((not walkable(grid, x - dx, y) and walkable(grid, x - dx, y + dy)) or
+                (not walkable(grid, x, y - dy) and walkable(grid, x + dx, y - dy)))
+    if dx != 0:
+        return ((not walkable(grid, x, y + 1) and walkable(grid, x + dx, y + 1)) or
+                (not walkable(grid, x, y - 1) and walkable(grid, x + dx, y - 1)))
+    return ((not walkable(grid, x + 1, y) and walkable(grid, x + 1, y + dy)) or
+            (not walkable(grid, x - 1, y) and walkable(grid, x - 1, y + dy)))
+
+def jump(grid, x, y, dx, dy, end):
+    """Moves from (x, y) in direction (dx, dy) until a jump point is found, None if there is none"""
+    while True:
+        x, y = x + dx, y + dy
+        if not walkable(grid, x, y):
+            return None
+        if (x, y) == end or has_forced(grid, x, y, dx, dy):
+            return (x, y)
+        if dx != 0 and dy != 0:
+            if jump(grid, x, y, dx, 0, end) is not None or jump(grid, x, y, 0, dy, end) is not None:
+                return (x, y)
+
+def pruned_directions(grid, x, y, dx, dy):
+    """The natural and forced neighbor directions of (x, y) when reached moving in (dx, dy)"""
+    if dx != 0 and dy != 0:
+        dirs = [(dx, 0), (0, dy), (dx, dy)]
+        if not walkable(grid, x - dx, y):
+            dirs.append((-dx, dy))
+        if not walkable(grid, x, y - dy):
+            dirs.append((dx, -dy))
+    elif dx != 0:
+        dirs = [(dx, 0)]
+        for s in (1, -1):
+            if not walkable(grid, x, y + s):
+                dirs.append((dx, s))
+    else:
+        dirs = [(0, dy)]
+        for s in (1, -1):
+            if not walkable(grid, x + s, y):
+                dirs.append((s, dy))
+    return dirs
+
+def jps(grid, start, end, stats=None):
+    """
+    Jump Point Search, an A* variant that only expands jump points and skips
+    over the symmetric paths through open areas. Moves follow the octile
+    cost model (diagonal moves cost sqrt(2)), for which it returns the same
+    path length as A*.
+    """
+    g = {start: 0}
+    parent = {start: None}
+    closed = set()
+    counter = 0
+    open_list = [(octile(start, end), counter, start)]
+    expanded = 0
+
+    while open_list:
+        _, _, node = heapq.heappop(open_list)
+        if node in closed:
+            continue
+        closed.add(node)
+        expanded += 1
+        if node == end:
+            break
+        x, y = node
+        if parent[node] is None:
+            dirs = DIRECTIONS
+        else:
+            px, py = parent[node]
+            dx, dy = (x > px) - (x < px), (y > py) - (y < py)
+            dirs = pruned_directions(grid, x, y, dx, dy)
+        for dx, dy in dirs:
+            nxt = jump(grid, x, y, dx, dy, end)
+            if nxt is None or nxt in closed:
+                continue
+            ng = g[node] + octile(node, nxt)
+            if ng < g.get(nxt, math.inf):
+                g[nxt] = ng
+                parent[nxt] = node
+                counter += 1
+                heapq.heappush(open_list, (ng + octile(nxt, end), counter, nxt))
+
+    if stats is not None:
+        stats["expanded"] = stats.get("expanded", 0) + expanded
+    if end not in closed:
+        return None
+
+    # fill in the cells between consecutive jump points, which lie on a straight or diagonal line
+    jump_points = reconstruct(parent, end)
+    path = [jump_points[0]]
+    for (x0, y0), (x1, y1) in zip(jump_points[:-1], jump_points[1:]):
+        dx, dy = (x1 > x0) - (x1 < x0), (y1 > y0) - (y1 < y0)
+        for i in range(1, max(abs(x1 - x0), abs(y1 - y0)) + 1):
+            path.append((x0 + i * dx, y0 + i * dy))
+    return path
+
+def distance_field(world, source, target=None):
+    """
+    Computes the number of 8-connected moves from source to every free cell
+    with a vectorized wavefront, one array step per distance level.
+
+    The 3x3 neighborhood is separable, so each level dilates the frontier
+    along the rows and then along the columns of a padded copy instead of
+    visiting cells one by one. If target is given, the wavefront stops as
+    soon as it is reached. Unreachable cells are -1.
+    """
+    free = np.asarray(world) == 0
+    rows, cols = free.shape
+    dist = np.full((rows, cols), -1, dtype=np.int32)
+    frontier = np.zeros((rows + 2, cols + 2), dtype=bool)
+    frontier[source[0] + 1, source[1] + 1] = True
+    unvisited = free.copy()
+    unvisited[source[0], source[1]] = False
+
+    d = 0
+    while True:
+        inner = frontier[1:-1, 1:-1]
+        dist[inner] = d
+        if target is not None and inner[target[0], target[1]]:
+            break
+        grown = frontier[:-2] | frontier[1:-1] | frontier[2:]
+        grown = grown[:, :-2] | grown[:, 1:-1] | grown[:, 2:]
+        grown &= unvisited
+        if not grown.any():
+            break
+        unvisited &= ~grown
+        frontier[1:-1, 1:-1] = grown
+        d += 1
+    return dist
+
+def descend(dist, start):
+    """Follows the distance field downhill from start to its source, None if start is unreachable"""
+    x, y = start
+    d = dist[x, y]
+    if d < 0:
+        return None
+    rows, cols = dist.shape
+    path = [(x, y)]
+    while d > 0:
+        for dx, dy in DIRECTIONS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < rows and 0 <= ny < cols and dist[nx, ny] == d - 1:
+                x, y, d = nx, ny, d - 1
+                break
+        path.append((x, y))
+    return path
+
+def plan_path(world: np.ndarray, start: Tuple[int, int], end: Tuple[int, int],
+              method: str = "astar", heuristic: str = "octile",
+              stats: Optional[dict] = None) -> Optional[np.ndarray]:
     """
     Computes a path from the start position to the end position 
-    using a certain planning algorithm (DFS is provided as an example).
+    using a certain planning algorithm (A* by default).
 
     Parameters:
     - world (np.ndarray): A 2D numpy array representing the grid environment.
@@ -48,6 +309,11 @@ def plan_path(world: np.ndarray, start: Tuple[int, int], end: Tuple[int, int]) -
       - 1 represents an obstacle.
     - start (Tuple[int, int]): The (row, column) coordinates of the starting position.
     - end (Tuple[int, int]): The (row, column) coordinates of the goal position.
+    - method (str): One of "dfs", "bfs", "dijkstra", "astar", "jps" or "field".
+    - heuristic (str): "octile" (diagonal moves cost sqrt(2)) or "chebyshev"
+      (every move costs 1). Used by "astar", and by "dijkstra" for its cost model.
+      "jps" always uses the octile cost model.
+    - stats (dict): Optional, receives the number of "expanded" nodes.
 
     Returns:
     - np.ndarray: A 2D numpy array where each row is a (row, column) coordinate of the path.
@@ -57,10 +323,30 @@ def plan_path(world: np.ndarray, start: Tuple[int, int], end: Tuple[int, int]) -
     start = (int(start[0]), int(start[1]))
     end = (int(end[0]), int(end[1]))
 
-    # Convert the numpy array to a list of lists for compatibility with the example DFS function
+    if method == "field":
+        # Grow the wavefront from the end until it reaches the start, then walk it back down
+        dist = distance_field(world, end, target=start)
+        if stats is not None:
+            stats["expanded"] = stats.get("expanded", 0) + int(np.count_nonzero(dist >= 0))
+        path = descend(dist, start)
+        return np.array(path) if path else None
+
+    # Convert the numpy array to a list of lists, indexing it is much faster from python
     world_list: List[List[int]] = world.tolist()
 
-    # Perform DFS pathfinding and return the result as a numpy array
-    path = dfs(world_list, start, end)
+    diagonal = SQRT2 if heuristic == "octile" else 1
+    if method == "dfs":
+        path = dfs(world_list, start, end, stats=stats)
+    elif method == "bfs":
+        path = bfs(world_list, start, end, stats=stats)
+    elif method == "dijkstra":
+        path = dijkstra(world_list, start, end, diagonal=diagonal, stats=stats)
+    elif method == "astar":
+        path = astar(world_list, start, end, heuristic=HEURISTICS[heuristic],
+                     diagonal=diagonal, stats=stats)
+    elif method == "jps":
+        path = jps(world_list, start, end, stats=stats)
+    else:
+        raise ValueError("unknown planning method: " + str(method))
 
     return np.array(path) if path else None